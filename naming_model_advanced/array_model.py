@@ -0,0 +1,181 @@
+from array import array
+import numpy as np
+from collector import StreamingCollector
+
+
+# In this backend opinions are small integer codes instead of strings: each of the two words is a bit and the
+# mixed opinion is just both bits set, so checking whether an agent knows a word is a bitwise and
+general_code = 1
+minority_code = 2
+mixed_code = general_code | minority_code
+# Value of an empty cell in the occupancy lattice
+empty_cell = -1
+# Relative positions of the Moore neighbourhood, in the same order Mesa visits them
+moore_offsets = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+# Number of actors whose random numbers are drawn in a single call to the generator
+chunk_size = 4096
+
+
+class ArrayNamingModel:
+    """Array-backed version of the advanced model, it takes the same parameters as NamingModel but keeps the whole
+    state in flat arrays, so that a step costs the same no matter how many agents there are. The state is built
+    with NumPy, but an update only reads and writes a few items, which is much faster on Python arrays and
+    bytearrays; np.frombuffer gives a NumPy view of them"""
+    def __init__(self, n, fraction, beta, width, height, groups_size, seed=None, collection=None):
+        self.running = True
+        self.num_agents = n
+        self.committed_fraction = fraction
+        self.max_groups = groups_size
+        self.propensity = beta
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        # Number of committed agents, as in NamingModel they are the last ones to be created
+        num_committed = round(n*fraction)
+        num_general = n-num_committed
+        # Agents are placed on distinct random cells, like SingleGrid.position_agent does
+        position = self.rng.choice(width*height, size=n, replace=False)
+        self.position = array("q", position.tobytes())
+        # Each cell (x, y) of the torus is stored at index x*height+y and contains the id of its agent
+        self.lattice = make_lattice(position, width, height)
+        self.committed = bytearray(n)
+        self.committed[num_general:] = bytes([True])*num_committed
+        self.opinion = bytearray([general_code])*num_general+bytearray([minority_code])*num_committed
+        # Number of agents holding each opinion, indexed by the opinion code
+        self.opinion_counts = [0, num_general, num_committed, 0]
+        # Agents involved in the last interaction, the first one is the speaker
+        self.mates = []
+        self.steps = 0
+        # Random numbers are drawn in chunks and consumed one actor at a time
+        self._draws = []
+        # Every step is kept in memory unless a dictionary with other arguments for the collector is given
+        self.datacollector = StreamingCollector({"Minority_Opinion": minority_counter,
+                                                 "General_Opinion": general_counter,
+                                                 "Mixed_Opinion": mixed_counter}, **(collection or {}))
+
+    def _refill_draws(self):
+        actors = self.rng.integers(0, self.num_agents, size=chunk_size)
+        uniforms = self.rng.random((chunk_size, 3))
+        # Reversed so that pop() returns them in the order they were drawn
+        self._draws = list(zip(actors.tolist(), uniforms.tolist()))[::-1]
+
+    def step(self):
+        if not self._draws:
+            self._refill_draws()
+        actor, (u_move, u_word, u_beta) = self._draws.pop()
+        self.mates = play(self, actor, u_move, u_word, u_beta)
+        self.steps += 1
+        self.datacollector.collect(self)
+
+    def run(self, k):
+        """Performs k asynchronous updates, same as calling step k times"""
+        for _ in range(k):
+            self.step()
+
+
+def make_lattice(position, width, height):
+    lattice = np.full(width*height, empty_cell, dtype=np.int64)
+    lattice[position] = np.arange(len(position))
+    return array("q", lattice.tobytes())
+
+
+def play(model, actor, u_move, u_word, u_beta):
+    """A single asynchronous update: the actor moves, gathers a group and speaks to it. The three uniform numbers
+    decide the direction of movement, the word said by a mixed speaker and the outcome of an agreement.
+    Returns the group, speaker first"""
+    width = model.width
+    height = model.height
+    lattice = model.lattice
+    cell = model.position[actor]
+    x, y = divmod(cell, height)
+    # The agent moves to a random free cell of its neighbourhood, if there is none they stay put
+    free = [c for c in neighbour_cells(x, y, width, height) if lattice[c] == empty_cell]
+    if free:
+        new_cell = free[int(u_move*len(free))]
+        lattice[cell] = empty_cell
+        lattice[new_cell] = actor
+        model.position[actor] = new_cell
+        x, y = divmod(new_cell, height)
+    group = gather_group(model, actor, x, y)
+    if len(group) > 1:
+        speak(model, group, u_word, u_beta)
+    return group
+
+
+def neighbour_cells(x, y, width, height):
+    if 0 < x < width-1 and 0 < y < height-1:
+        # Away from the border of the torus there is no wrapping, the cells are in the order of moore_offsets
+        cell = x*height+y
+        return [cell-height-1, cell-height, cell-height+1, cell-1, cell+1, cell+height-1, cell+height, cell+height+1]
+    return [((x+dx) % width)*height+(y+dy) % height for dx, dy in moore_offsets]
+
+
+def gather_group(model, actor, x, y):
+    """Breadth-first expansion from the actor through occupied neighbouring cells, until the group reaches
+    max_groups agents or there is no one else to reach"""
+    width = model.width
+    height = model.height
+    lattice = model.lattice
+    group = [actor]
+    seen = {actor}
+    frontier = [(x, y)]
+    for fx, fy in frontier:
+        for c in neighbour_cells(fx, fy, width, height):
+            mate = lattice[c]
+            if mate == empty_cell or mate in seen:
+                continue
+            seen.add(mate)
+            group.append(mate)
+            if len(group) >= model.max_groups:
+                return group
+            frontier.append(divmod(c, height))
+    return group
+
+
+def speak(model, group, u_word, u_beta):
+    opinion = model.opinion
+    committed = model.committed
+    counts = model.opinion_counts
+    speaker = group[0]
+    # If the speaker has a mixed opinion, they randomly chose one of the two words
+    word = opinion[speaker]
+    if word == mixed_code:
+        word = general_code if u_word < 0.5 else minority_code
+    disagreement = False
+    for agent in group[1:]:
+        current = opinion[agent]
+        if current & word:
+            continue
+        disagreement = True
+        if not committed[agent]:
+            opinion[agent] = mixed_code
+            counts[current] -= 1
+            counts[mixed_code] += 1
+    if disagreement:
+        return
+    # Everyone knows the word, with probability beta they all keep only that one
+    if u_beta < model.propensity:
+        for agent in group:
+            current = opinion[agent]
+            if current != word:
+                opinion[agent] = word
+                counts[current] -= 1
+                counts[word] += 1
+
+
+# Same reporters of the Mesa model, read from the opinion counts
+def mixed_counter(model):
+    return model.opinion_counts[mixed_code]/model.num_agents
+
+
+def minority_counter(model):
+    return model.opinion_counts[minority_code]/model.num_agents
+
+
+def general_counter(model):
+    return model.opinion_counts[general_code]/model.num_agents
+
+
+def only_one_opinion(model):
+    counts = model.opinion_counts
+    return counts[mixed_code] == 0 and (counts[general_code] == 0 or counts[minority_code] == 0)
@@ -0,0 +1,147 @@
+import argparse
+import json
+import platform
+import time
+import os
+import sys
+# Modules shared with the minimal model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+import naming_model
+import array_model
+from profiling import PhaseProfiler
+
+# Seeded benchmark suite of the advanced model. It measures the step throughput and the wall-clock time to
+# consensus on a set of parameter points, and how the time of a Mesa step splits among its phases. Results are
+# written as JSON and can be compared against a stored baseline to catch regressions
+
+# Parameter points for the throughput measurements, they vary density, grid size, group size and beta
+throughput_suite = [
+    {"name": "article", "n": 327, "fraction": 0.003, "beta": 0.336, "width": 50, "height": 50, "groups_size": 5},
+    {"name": "dense", "n": 2000, "fraction": 0.003, "beta": 0.336, "width": 50, "height": 50, "groups_size": 5},
+    {"name": "dense_big_groups", "n": 2000, "fraction": 0.003, "beta": 0.336, "width": 50, "height": 50,
+     "groups_size": 10},
+    {"name": "always_agree", "n": 327, "fraction": 0.003, "beta": 1.0, "width": 50, "height": 50, "groups_size": 5},
+    {"name": "large_grid", "n": 20000, "fraction": 0.003, "beta": 0.336, "width": 200, "height": 200,
+     "groups_size": 5},
+]
+# Parameter points for the time to consensus, above the tipping point so that consensus is reached
+consensus_suite = [
+    {"name": "committed_20", "n": 327, "fraction": 0.2, "beta": 0.336, "width": 50, "height": 50, "groups_size": 5},
+    {"name": "committed_20_big_groups", "n": 327, "fraction": 0.2, "beta": 0.336, "width": 50, "height": 50,
+     "groups_size": 10},
+]
+backends = {"mesa": (naming_model.NamingModel, naming_model),
+            "array": (array_model.ArrayNamingModel, array_model)}
+
+
+def make_model(params, backend, seed):
+    model_class, _ = backends[backend]
+    # Only the final state matters here, a log-spaced series keeps the collection cheap and bounded
+    return model_class(params["n"], params["fraction"], params["beta"], params["width"], params["height"],
+                       params["groups_size"], seed=seed, collection={"policy": "log"})
+
+
+def measure_throughput(params, backend, seed, steps, warmup):
+    model = make_model(params, backend, seed)
+    model.run(warmup)
+    start = time.perf_counter()
+    model.run(steps)
+    return steps/(time.perf_counter()-start)
+
+
+def measure_consensus(params, backend, seed, max_steps, min_steps=100):
+    _, reporters = backends[backend]
+    model = make_model(params, backend, seed)
+    start = time.perf_counter()
+    for i in range(1, max_steps+1):
+        model.step()
+        if i >= min_steps and reporters.only_one_opinion(model):
+            return i, time.perf_counter()-start
+    return None, time.perf_counter()-start
+
+
+def measure_phases(params, seed, steps, warmup):
+    """Average time per step spent moving, forming groups, speaking and collecting data in the Mesa model"""
+    model = make_model(params, "mesa", seed)
+    model.run(warmup)
+    # The profiler is attached after the warmup, so that only the measured steps are instrumented
+    model.profiler = PhaseProfiler()
+    start = time.perf_counter()
+    model.run(steps)
+    total = time.perf_counter()-start
+    phases = {name: value/steps for name, value in model.profiler.timings.items()}
+    phases["total"] = total/steps
+    return phases
+
+
+def run_suite(backends_to_run, quick=False, seed=0):
+    steps = 2000 if quick else 20000
+    warmup = 200 if quick else 2000
+    max_steps = 50000 if quick else 500000
+    results = []
+    for params in throughput_suite:
+        for backend in backends_to_run:
+            result = {"kind": "throughput", "backend": backend, "seed": seed}
+            result.update(params)
+            result["steps_per_second"] = measure_throughput(params, backend, seed, steps, warmup)
+            if backend == "mesa":
+                result["phases"] = measure_phases(params, seed, steps, warmup)
+            results.append(result)
+            print("%-11s %-24s %-6s %12.0f steps/s" % ("throughput", params["name"], backend,
+                                                       result["steps_per_second"]))
+    for params in consensus_suite:
+        for backend in backends_to_run:
+            result = {"kind": "consensus", "backend": backend, "seed": seed}
+            result.update(params)
+            result["consensus_steps"], result["consensus_seconds"] = measure_consensus(params, backend, seed,
+                                                                                       max_steps)
+            results.append(result)
+            print("%-11s %-24s %-6s %12.2f s (%s steps)" % ("consensus", params["name"], backend,
+                                                            result["consensus_seconds"], result["consensus_steps"]))
+    return {"python": platform.python_version(), "machine": platform.machine(), "quick": quick,
+            "results": results}
+
+
+def compare(report, baseline, tolerance):
+    """Returns the list of measurements that got worse than the baseline by more than the tolerance"""
+    reference = {(r["kind"], r["name"], r["backend"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = reference.get((result["kind"], result["name"], result["backend"]))
+        if old is None:
+            continue
+        if result["kind"] == "throughput":
+            ratio = result["steps_per_second"]/old["steps_per_second"]
+        else:
+            ratio = old["consensus_seconds"]/result["consensus_seconds"]
+        if ratio < 1-tolerance:
+            regressions.append("%s %s %s: %.0f%% of the baseline speed" % (result["kind"], result["name"],
+                                                                         result["backend"], 100*ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark suite of the naming game with groups")
+    parser.add_argument("--backend", choices=["mesa", "array", "both"], default="both")
+    parser.add_argument("--quick", action="store_true", help="fewer steps, for a fast check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file where the results are written")
+    parser.add_argument("--baseline", default=None, help="JSON file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown with respect to the baseline that counts as a regression")
+    args = parser.parse_args(argv)
+    report = run_suite(list(backends) if args.backend == "both" else [args.backend], args.quick, args.seed)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import numpy as np
+import os
+import sys
+# Modules shared with the minimal model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+import naming_model
+import array_model
+
+# Statistical equivalence check between the Mesa implementation and the array backend: we run independent
+# replicates of both models with the same parameters and compare the mean opinion fractions after a fixed number
+# of steps with a two sample z test
+a_val = [327, 0.1, 0.336, 50, 50, 5]  # n. agents, committed fraction, beta, width, height, group size
+replicates = 40
+num_steps = 5000
+# Largest z score we accept, above this value the two implementations are considered different
+max_z = 3.0
+
+
+def final_fractions(model, module):
+    for _ in range(num_steps):
+        model.step()
+    return [module.minority_counter(model), module.general_counter(model), module.mixed_counter(model)]
+
+
+mesa_results = []
+array_results = []
+for seed in range(replicates):
+    mesa_results.append(final_fractions(naming_model.NamingModel(*a_val, seed=seed), naming_model))
+    array_results.append(final_fractions(array_model.ArrayNamingModel(*a_val, seed=seed), array_model))
+
+mesa_results = np.array(mesa_results)
+array_results = np.array(array_results)
+equivalent = True
+for i, label in enumerate(["Minority_Opinion", "General_Opinion", "Mixed_Opinion"]):
+    mean_mesa = mesa_results[:, i].mean()
+    mean_array = array_results[:, i].mean()
+    std_err = np.sqrt((mesa_results[:, i].var(ddof=1)+array_results[:, i].var(ddof=1))/replicates)
+    z = abs(mean_mesa-mean_array)/std_err if std_err > 0 else 0.0
+    print("%s: mesa %.4f, array %.4f, z = %.2f" % (label, mean_mesa, mean_array, z))
+    if z > max_z:
+        equivalent = False
+
+print("Equivalent" if equivalent else "NOT equivalent")
+if not equivalent:
+    raise SystemExit(1)
@@ -0,0 +1,159 @@
+from array import array
+import json
+import numpy as np
+from collector import StreamingCollector
+from naming_model import NamingModel
+from array_model import ArrayNamingModel, make_lattice
+
+# Checkpoints of the advanced model: the whole state of a NamingModel or of an ArrayNamingModel (positions,
+# opinions, committed agents, random generator and the series collected so far) is saved in a single compressed
+# NumPy archive. A model loaded from a checkpoint continues exactly as the original one would have, so many
+# continuations can be forked from the same warmed-up state
+
+def random_state_arrays(rng):
+    """The state of a random.Random as arrays"""
+    version, internal, gauss_next = rng.getstate()
+    return {"rng_version": np.array(version), "rng_internal": np.array(internal, dtype=np.uint32),
+            "rng_gauss_next": np.array(np.nan if gauss_next is None else gauss_next)}
+
+
+def random_state_from_arrays(data):
+    gauss_next = float(data["rng_gauss_next"])
+    return (int(data["rng_version"]), tuple(int(v) for v in data["rng_internal"]),
+            None if np.isnan(gauss_next) else gauss_next)
+
+
+def series_arrays(datacollector):
+    """The series collected so far, together with what is needed to continue the collection"""
+    if isinstance(datacollector, StreamingCollector):
+        state = datacollector.state()
+        arrays = {"collector_streaming": np.array(True),
+                  "collector_settings": np.array(json.dumps(datacollector.settings())),
+                  "collector_counters": np.array([state["calls"], state["next_log_step"], state["stored"]]),
+                  "collector_last_values": np.array(state["last_values"] if state["last_values"] is not None
+                                                    else [], dtype=np.float64)}
+        # A series streamed to disk stays in its files, see StreamingCollector.state
+        if "steps" in state:
+            arrays.update(series_steps=state["steps"], series_values=state["values"])
+        return arrays
+    # One array per reporter, so that each column keeps its type
+    series = {"series_"+name: np.array(values) for name, values in datacollector.model_vars.items()}
+    return {"collector_streaming": np.array(False), **series}
+
+
+def restore_series(model, data):
+    if not bool(data["collector_streaming"]):
+        for name in model.datacollector.model_reporters:
+            model.datacollector.model_vars[name] = data["series_"+name].tolist()
+        return
+    calls, next_log_step, stored = (int(v) for v in data["collector_counters"])
+    last_values = data["collector_last_values"].tolist()
+    state = {"calls": calls, "next_log_step": next_log_step, "last_values": last_values if last_values else None,
+             "stored": stored}
+    if "series_steps" in data:
+        state.update(steps=data["series_steps"], values=data["series_values"])
+    else:
+        state["path"] = json.loads(str(data["collector_settings"]))["path"]
+    model.datacollector.restore(state)
+
+
+def collection_settings(data, collection_path):
+    if not bool(data["collector_streaming"]):
+        return None
+    settings = json.loads(str(data["collector_settings"]))
+    # A series streamed to disk continues in its old directory, cut back to the checkpoint, unless a new one is
+    # given, where the rows up to the checkpoint get copied
+    if settings["path"] is not None and collection_path is not None:
+        settings["path"] = collection_path
+    return settings
+
+
+def model_params(model):
+    if isinstance(model, NamingModel):
+        width, height = model.grid.width, model.grid.height
+    else:
+        width, height = model.width, model.height
+    return np.array([model.num_agents, model.committed_fraction, model.propensity, width, height,
+                     model.max_groups], dtype=np.float64)
+
+
+def save_checkpoint(model, path):
+    if isinstance(model, ArrayNamingModel):
+        save_array_checkpoint(model, path)
+        return
+    agents = sorted(model.agents, key=lambda a: a.unique_id)
+    np.savez_compressed(
+        path,
+        backend=np.array("mesa"),
+        params=model_params(model),
+        positions=np.array([a.pos for a in agents], dtype=np.int32),
+        # Both models code opinions the same way, and keep them in arrays indexed by unique_id
+        opinions=np.frombuffer(model.opinion, dtype=np.int8),
+        committed=np.frombuffer(model.committed, dtype=bool),
+        # The actors already drawn for the next updates are part of the state as well
+        actors=np.array([a.unique_id for a in model._actors], dtype=np.int64),
+        **random_state_arrays(model.random),
+        **series_arrays(model.datacollector))
+
+
+def save_array_checkpoint(model, path):
+    # The random numbers already drawn for the next actors are part of the state as well
+    draws = model._draws
+    np.savez_compressed(
+        path,
+        backend=np.array("array"),
+        params=model_params(model),
+        position=np.frombuffer(model.position, dtype=np.int64),
+        opinion=np.frombuffer(model.opinion, dtype=np.int8),
+        committed=np.frombuffer(model.committed, dtype=bool),
+        steps=np.array(model.steps),
+        draw_actors=np.array([d[0] for d in draws], dtype=np.int64),
+        draw_uniforms=np.array([d[1] for d in draws], dtype=np.float64).reshape(-1, 3),
+        rng_state=np.array(json.dumps(model.rng.bit_generator.state)),
+        **series_arrays(model.datacollector))
+
+
+def load_checkpoint(path, collection_path=None, **kwargs):
+    """Rebuilds the model saved in path, the extra keyword arguments (visualize, profiler) are given to the
+    model. If the series was streamed to disk, collection_path gives the directory where it continues,
+    so that forks of the same checkpoint don't write on each other's files"""
+    with np.load(path) as data:
+        n, fraction, beta, width, height, groups_size = data["params"].tolist()
+        params = (int(n), fraction, beta, int(width), int(height), int(groups_size))
+        collection = collection_settings(data, collection_path)
+        if str(data["backend"]) == "array":
+            model = ArrayNamingModel(*params, collection=collection)
+            restore_array_state(model, data)
+        else:
+            model = NamingModel(*params, collection=collection, **kwargs)
+            restore_mesa_state(model, data)
+        restore_series(model, data)
+    return model
+
+
+def restore_mesa_state(model, data):
+    agents = sorted(model.agents, key=lambda a: a.unique_id)
+    # All the agents leave the grid before being placed again, so that cells never overflow
+    for a in agents:
+        model.occupancy.remove(a.pos)
+        model.grid.remove_agent(a)
+    for a, pos in zip(agents, data["positions"]):
+        pos = (int(pos[0]), int(pos[1]))
+        model.occupancy.add(pos)
+        model.grid.place_agent(a, pos)
+    model.opinion[:] = data["opinions"].tobytes()
+    model.committed[:] = data["committed"].tobytes()
+    model.opinion_counts = np.bincount(data["opinions"], minlength=4).tolist()
+    model._actors = [agents[i] for i in data["actors"].tolist()]
+    model.random.setstate(random_state_from_arrays(data))
+
+
+def restore_array_state(model, data):
+    model.position = array("q", data["position"].astype(np.int64).tobytes())
+    model.lattice = make_lattice(data["position"], model.width, model.height)
+    model.opinion = bytearray(data["opinion"].tobytes())
+    model.committed = bytearray(data["committed"].tobytes())
+    model.opinion_counts = np.bincount(data["opinion"], minlength=4).tolist()
+    model.steps = int(data["steps"])
+    model._draws = list(zip(data["draw_actors"].tolist(), data["draw_uniforms"].tolist()))
+    model.rng.bit_generator.state = json.loads(str(data["rng_state"]))
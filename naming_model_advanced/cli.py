@@ -0,0 +1,129 @@
+import argparse
+import json
+import time
+import os
+import sys
+# Modules shared with the minimal model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+from collector import collection_policies
+
+# Headless entry point of the advanced model: only the simulation core gets imported, the server and matplotlib are
+# imported only when --serve or --plot ask for them
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the naming game with groups without a browser")
+    parser.add_argument("--n", type=int, default=327, help="number of agents")
+    parser.add_argument("--fraction", type=float, default=0.003, help="fraction of committed agents")
+    parser.add_argument("--beta", type=float, default=0.336, help="probability of agreeing on a shared word")
+    parser.add_argument("--width", type=int, default=50, help="width of the grid")
+    parser.add_argument("--height", type=int, default=50, help="height of the grid")
+    parser.add_argument("--groups-size", type=int, default=5, help="maximum size of a group, speaker included")
+    parser.add_argument("--backend", choices=["mesa", "array", "tiled"], default=None,
+                        help="Mesa agents (the default), the array-backed model or its parallel version (where a step "
+                             "is a sweep)")
+    parser.add_argument("--processes", type=int, default=None, help="with the tiled backend, worker processes")
+    parser.add_argument("--network", default=None,
+                        help="play on a contact network instead of the grid, with its own vectorized model (so "
+                             "without --backend): lattice (the largest square with at most n nodes), small_world, "
+                             "erdos_renyi, scale_free or the path of an edge list")
+    parser.add_argument("--degree", type=int, default=8,
+                        help="with --network, mean degree of the generated network (minimum degree for scale_free)")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="with the tiled backend, side of a tile (it changes the result of a seed, by default it "
+                             "depends only on the lattice and the groups size)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=500000, help="maximum number of steps")
+    parser.add_argument("--min-steps", type=int, default=100, help="steps before checking for consensus")
+    parser.add_argument("--output", default=None,
+                        help="directory where the collected series is written, one binary file per column")
+    parser.add_argument("--policy", choices=collection_policies, default="log", help="collection policy")
+    parser.add_argument("--period", type=int, default=1, help="steps between collections with the every policy")
+    parser.add_argument("--plot", action="store_true", help="plot the collected series at the end")
+    parser.add_argument("--serve", action="store_true", help="launch the visualization server instead")
+    parser.add_argument("--live", action="store_true",
+                        help="with --serve, run the model in the background and send only the changed cells")
+    parser.add_argument("--frame-steps", type=int, default=None,
+                        help="with --live, steps between frames instead of following the frame rate of the page")
+    args = parser.parse_args(argv)
+    if args.network is not None:
+        if args.backend is not None:
+            parser.error("--network has its own model, it does not take --backend")
+        args.backend = "network"
+    elif args.backend is None:
+        args.backend = "mesa"
+    # The page of the server shows the grid of the mesa model, the live page also the one of the array backend
+    servable = ["mesa", "array"] if args.live else ["mesa"]
+    if args.serve and args.backend not in servable:
+        parser.error("--serve%s cannot show the %s model" % (" --live" if args.live else "", args.backend))
+    return args
+
+
+def make_model(args, collection):
+    """The model chosen by the arguments, together with the module of its reporters"""
+    if args.backend == "network":
+        import network
+        import network_model as core
+        graph = network.make_network(args.network, args.n, args.degree, seed=args.seed)
+        return core, core.NetworkNamingModel(graph, args.fraction, args.beta, args.groups_size, seed=args.seed,
+                                             collection=collection)
+    params = (args.n, args.fraction, args.beta, args.width, args.height, args.groups_size)
+    if args.backend == "array":
+        import array_model as core
+        return core, core.ArrayNamingModel(*params, seed=args.seed, collection=collection)
+    if args.backend == "tiled":
+        import tiled_model as core
+        return core, core.TiledNamingModel(*params, seed=args.seed, collection=collection,
+                                           tile_size=args.tile_size, processes=args.processes)
+    import naming_model as core
+    return core, core.NamingModel(*params, seed=args.seed, collection=collection)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        if args.live:
+            from naming_server import make_live_server
+            import array_model
+            import naming_model
+            model_class = array_model.ArrayNamingModel if args.backend == "array" else naming_model.NamingModel
+            server = make_live_server(model_class, args.frame_steps)
+        else:
+            from naming_server import server
+        server.port = 8521
+        server.launch()
+        return
+    collection = {"policy": args.policy, "period": args.period, "path": args.output}
+    core, model = make_model(args, collection)
+    start_time = time.time()
+    consensus_time = None
+    try:
+        for i in range(1, args.steps+1):
+            model.step()
+            if i >= args.min_steps and core.only_one_opinion(model):
+                consensus_time = i
+                break
+        model.datacollector.flush()
+    finally:
+        # The tiled backend holds shared memory and worker processes, released even on errors and Ctrl-C
+        if hasattr(model, "close"):
+            model.close()
+    # A single line of JSON, easy to gather from many jobs
+    summary = {"n": model.num_agents, "fraction": args.fraction, "beta": args.beta,
+               "groups_size": args.groups_size, "seed": args.seed, "Consensus_Time": consensus_time,
+               "Minority_Opinion": core.minority_counter(model),
+               "General_Opinion": core.general_counter(model),
+               "Mixed_Opinion": core.mixed_counter(model),
+               "seconds": time.time()-start_time}
+    if args.backend == "tiled":
+        # The tile side is part of what decides the result of a seed
+        summary["tile_size"] = model.tile_size
+    print(json.dumps(summary))
+    if args.plot:
+        import matplotlib.pyplot as plt
+        model.datacollector.get_model_vars_dataframe().plot()
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import mesa
+import os
+import sys
+# Modules shared with the minimal model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
 from naming_model import NamingModel
 from naming_model import only_one_opinion
-from naming_server import width, height
+from naming_model import width, height
 from mesa.batchrunner import FixedBatchRunner
 from naming_model import minority_counter, mixed_counter, general_counter
 import matplotlib.pyplot as plt
@@ -2,97 +2,162 @@ from mesa import Agent, Model
 from mesa.time import RandomActivation
 from mesa.space import SingleGrid
 from mesa.datacollection import DataCollector
-import numpy as np
-import random
-from random import uniform
-from random import randint
+from collector import StreamingCollector
+from occupancy import Occupancy
+import time
 
 
-# The two conflicting opinions agents can have
-general_opinion = "A"
-minority_opinion = "B"
-mixed_opinion = [general_opinion, minority_opinion]
+# The two conflicting opinions agents can have. Opinions are small integer codes where each word is a bit, so the
+# mixed opinion is just both bits set and checking whether an agent knows a word is a bitwise and. The codes are
+# the same of the array backend
+general_opinion = 1
+minority_opinion = 2
+mixed_opinion = general_opinion | minority_opinion
+# Number of actors drawn at once by NamingModel
+chunk_size = 4096
+# Relative positions of the Moore neighbourhood, in the same order Mesa visits them
+moore_offsets = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+
+# Default dimensions of the grid (number of cells x number of cells)
+width = 50
+height = 50
 
 
 class PersonAgent(Agent):
-    """The agent class of the model"""
+    """The agent class of the model. The opinion of the agent and whether they are committed are kept in the model's
+    arrays at the index unique_id, so an agent only stores what Mesa needs"""
     def __init__(self, unique_id, model, committed):
         # Call the superclass constructor
         super().__init__(unique_id, model)
         # This parameter indicates whether the agent is willing the change their mind
-        self.is_committed = committed
-        self.active = False
-        self.mates = []
+        model.committed[unique_id] = committed
         # When initializing an agent, only committed agents have the minority opinion
-        self.opinion = minority_opinion if self.is_committed else general_opinion
+        opinion = minority_opinion if committed else general_opinion
+        model.opinion[unique_id] = opinion
+        model.opinion_counts[opinion] += 1
+
+    @property
+    def opinion(self):
+        return self.model.opinion[self.unique_id]
+
+    @property
+    def is_committed(self):
+        return bool(self.model.committed[self.unique_id])
+
+    @property
+    def active(self):
+        # Whether the agent took part in the last interaction, see NamingModel.highlight
+        return self in self.model.active_agents
 
     def move(self):
-        # The agent is almost forced to move, so we don't include the center
-        possible_steps = self.model.grid.get_neighborhood(
-            self.pos, moore=True, include_center=False)
-        # We shuffle the array of possible positions to have at each call a random direction of movement
-        np.random.shuffle(possible_steps)
-        # We cycle through all the possible steps, the number of maximum agents that can be in a single cell is a
-        # parameter of the model
-        for pos in possible_steps:
-            # Only if the agent can't find a valid cell to move in they stay put
-            if len(self.model.grid.get_cell_list_contents([pos])) < 1:
-                self.model.grid.move_agent(self, pos)
-                return
+        # The agent is almost forced to move, so we don't include the center. Among the empty neighbouring cells
+        # they pick one at random
+        possible_steps = self.model.occupancy.free_neighbours(self.pos)
+        # Only if the agent can't find a valid cell to move in they stay put
+        if possible_steps:
+            pos = self.random.choice(possible_steps)
+            self.model.occupancy.move(self.pos, pos)
+            self.model.grid.move_agent(self, pos)
 
     def speak(self, other_agents):
+        """Returns the outcome of the interaction: "disagreement" if someone didn't know the word, "success" if
+        everyone kept only that word, "no_change" otherwise"""
+        model = self.model
+        opinion = model.opinion
+        committed = model.committed
         # If the speaker has a mixed opinion, they randomly chose one of the two words
-        word = self.opinion if not self.opinion == mixed_opinion else mixed_opinion[randint(0, 1)]
+        word = opinion[self.unique_id]
+        if word == mixed_opinion:
+            word = (general_opinion, minority_opinion)[self.random.randint(0, 1)]
         # We initialize an disagreement parameter to False
         disagreement = False
         for agent in other_agents:
-            # If another agent has the same opinion as ours, we do nothing
-            if word in agent.opinion:
+            # If another agent knows our word, we do nothing
+            if opinion[agent.unique_id] & word:
                 continue
             # Else we set the disagreement parameter to True and, if the agent disagreeing is not committed, we set
             # their opinion to mixed
             disagreement = True
-            if not agent.is_committed:
-                agent.opinion = mixed_opinion
+            if not committed[agent.unique_id]:
+                model.set_opinion(agent.unique_id, mixed_opinion)
         # If someone disagreed we do nothing
         if disagreement:
-            return
+            return "disagreement"
         # Else, with probability of beta, we change everyone's opinion to the chosen one
-        if uniform(0, 1) < self.model.propensity:
-            self.opinion = word
+        if self.random.random() < model.propensity:
+            model.set_opinion(self.unique_id, word)
             for agent in other_agents:
-                agent.opinion = word
+                model.set_opinion(agent.unique_id, word)
+            return "success"
+        return "no_change"
 
     def step(self):
+        """Moves, gathers a group and speaks to it. Returns the listeners"""
         self.move()
         # If they are a speaker: first thing they move
-        # Then gather the cellmates
-        cellmates = []
-        create_group(self, cellmates)
-        if self in cellmates:
-            cellmates.remove(self)
-        self.mates = cellmates
-        # Must delete themselves among the list of cellmates, this way the cellmates array contains the listeners
+        # Then gather the cellmates, that will be the listeners
+        cellmates = create_group(self)
         # If there isn't any cellmate, do nothing
-        if not np.any(cellmates):
-            return
+        if not cellmates:
+            return cellmates
         # Speak to their cellmates, that become listeners
         self.speak(cellmates)
+        return cellmates
+
+    def profiled_step(self, profiler):
+        # Same as step, but every phase reports to the profiler
+        start = time.perf_counter()
+        old_pos = self.pos
+        self.move()
+        profiler.count("moves")
+        if self.pos == old_pos:
+            profiler.count("failed_moves")
+        start = profiler.add_time("move", start)
+        cellmates = create_group(self)
+        start = profiler.add_time("create_group", start)
+        profiler.group(len(cellmates)+1)
+        if not cellmates:
+            return cellmates
+        outcome = self.speak(cellmates)
+        profiler.add_time("speak", start)
+        profiler.count("interactions")
+        if outcome == "success":
+            profiler.count("successes")
+        elif outcome == "disagreement":
+            profiler.count("disagreements")
+        return cellmates
 
 
 class NamingModel(Model):
     """The model class"""
-    def __init__(self, n, fraction, beta, width, height, groups_size):
+    def __init__(self, n, fraction, beta, width, height, groups_size, seed=None, collection=None, visualize=False,
+                 profiler=None):
         # Call the superclass constructor
         super().__init__()
+        # Every random draw of the model and of its agents goes through self.random, so a seed makes a run
+        # reproducible
+        self.reset_randomizer(seed)
         self.running = True
         self.num_agents = n
         self.committed_fraction = fraction
         self.max_groups = groups_size
         self.propensity = beta
+        # The agents involved in the last interaction are highlighted only when a visualization is attached
+        self.visualize = visualize
+        self.active_agents = set()
+        # Optional PhaseProfiler, when None the steps are not instrumented
+        self.profiler = profiler
         # Standard grid and schedule instantiations
         self.grid = SingleGrid(width, height, True)
         self.schedule = RandomActivation(self)
+        # Occupied cells of the grid, with the index of the empty ones
+        self.occupancy = Occupancy(width, height, 1)
+        # Opinion and commitment of each agent, indexed by unique_id, one byte per agent
+        self.opinion = bytearray(n)
+        self.committed = bytearray(n)
+        # Number of agents holding each opinion, indexed by the opinion code and kept up to date by set_opinion
+        self.opinion_counts = [0, 0, 0, 0]
         # Number of committed agents
         num_committed = round(n*fraction)
         # Number of non-committed agents
@@ -100,64 +165,115 @@ class NamingModel(Model):
         # Calls the method for creating agents, we create the non-committed agents first, then the committed ones
         self.create_agents(num_general, 0, False)
         self.create_agents(num_committed, num_general, True)
-        self.datacollector = DataCollector(
-            model_reporters={"Minority_Opinion": minority_counter,
-                             "General_Opinion": general_counter,
-                             "Mixed_Opinion": mixed_counter},
-            agent_reporters={}
-        )
+        # Agents are never added or removed, so the list the actors are drawn from is built once
+        self.agents = self.schedule.agents
+        # Actors are drawn chunk_size at a time and consumed one per update, by step and run alike, so that a seed
+        # gives the same run however the updates are grouped in calls
+        self._actors = []
+        model_reporters = {"Minority_Opinion": minority_counter,
+                           "General_Opinion": general_counter,
+                           "Mixed_Opinion": mixed_counter}
+        # By default every step is collected by Mesa's DataCollector, for long runs a dictionary with the arguments
+        # of a StreamingCollector can be given instead
+        if collection is None:
+            self.datacollector = DataCollector(model_reporters=model_reporters, agent_reporters={})
+        else:
+            self.datacollector = StreamingCollector(model_reporters, **collection)
 
     def create_agents(self, num, already_existent, are_committed):
         for i in range(num):
             a = PersonAgent(already_existent+i, self, are_committed)
             self.schedule.add(a)
-            self.grid.position_agent(a, x="random", y="random")
+            # Each agent gets a random empty cell
+            pos = self.occupancy.random_free_cell(self.random)
+            self.occupancy.add(pos)
+            self.grid.place_agent(a, pos)
 
     def step(self):
-        for agent in self.schedule.agents:
-            agent.active = False
-        actor = random.choice(self.schedule.agents)
-        actor.step()
-        actor.active = True
-        for agent in actor.mates:
-            agent.active = True
+        self.run(1)
+
+    def run(self, k):
+        """Performs k asynchronous updates, each one followed by a data collection, same as calling step k times"""
+        for _ in range(k):
+            if not self._actors:
+                # Reversed so that pop() returns them in the order they were drawn
+                self._actors = self.random.choices(self.agents, k=chunk_size)[::-1]
+            actor = self._actors.pop()
+            if self.profiler is not None:
+                self.profiled_update(actor)
+                continue
+            mates = actor.step()
+            if self.visualize:
+                self.highlight(actor, mates)
+            self.datacollector.collect(self)
+
+    def set_opinion(self, agent_id, opinion):
+        # Every change of opinion goes through here, so that the counts stay up to date
+        current = self.opinion[agent_id]
+        if opinion == current:
+            return
+        self.opinion_counts[current] -= 1
+        self.opinion_counts[opinion] += 1
+        self.opinion[agent_id] = opinion
+
+    def profiled_update(self, actor):
+        mates = actor.profiled_step(self.profiler)
+        if self.visualize:
+            self.highlight(actor, mates)
+        start = time.perf_counter()
         self.datacollector.collect(self)
+        self.profiler.add_time("collect", start)
+        self.profiler.end_step()
 
+    def highlight(self, actor, mates):
+        # Only the group of the last interaction is kept, agents don't store their mates
+        self.active_agents = {actor, *mates}
 
-# Functions to calculate the variables we want to keep track of
+
+# Functions to calculate the variables we want to keep track of, they read the counts the model keeps
+# instead of going through all the agents
 def mixed_counter(model):
-    return sum([agent.opinion == mixed_opinion for agent in model.schedule.agents])/model.num_agents
+    return model.opinion_counts[mixed_opinion]/model.num_agents
 
 
 def minority_counter(model):
-    return sum([agent.opinion == minority_opinion for agent in model.schedule.agents])/model.num_agents
+    return model.opinion_counts[minority_opinion]/model.num_agents
 
 
 def general_counter(model):
-    return sum([agent.opinion == general_opinion for agent in model.schedule.agents])/model.num_agents
+    return model.opinion_counts[general_opinion]/model.num_agents
 
 
 # Utility function to check whether there are still more than one opinion among the agents
 def only_one_opinion(model):
-    if mixed_counter(model) == 0:
-        if general_counter(model) == 0:
+    counts = model.opinion_counts
+    if counts[mixed_opinion] == 0:
+        if counts[general_opinion] == 0:
             return True
-        if minority_counter(model) == 0:
+        if counts[minority_opinion] == 0:
             return True
     return False
 
 
-def create_group(speaker, global_mates):
-    mates = speaker.model.grid.get_neighbors(speaker.pos, moore=True, include_center=False)
-    to_exit = True
-    for mate in mates:
-        if not(mate in global_mates):
-            to_exit = False
-            global_mates.append(mate)
-            if len(global_mates) >= speaker.model.max_groups-1:
-                to_exit = True
-                break
-    if to_exit:
-        return
-    for agent in mates:
-        create_group(agent, global_mates)
+def create_group(speaker):
+    """Returns the listeners of the speaker: starting from the speaker we expand breadth-first through the occupied
+    neighbouring cells of the toroidal grid, until the group (speaker included) has max_groups agents or there is
+    no one else to reach"""
+    grid = speaker.model.grid
+    max_mates = speaker.model.max_groups-1
+    mates = []
+    seen = {speaker}
+    frontier = [speaker.pos]
+    for x, y in frontier:
+        for dx, dy in moore_offsets:
+            nx = (x+dx) % grid.width
+            ny = (y+dy) % grid.height
+            mate = grid[nx][ny]
+            if mate is None or mate in seen:
+                continue
+            seen.add(mate)
+            mates.append(mate)
+            if len(mates) >= max_mates:
+                return mates
+            frontier.append((nx, ny))
+    return mates
@@ -1,13 +1,12 @@
-from naming_model import NamingModel
+import numpy as np
+from naming_model import NamingModel, width, height
 from mesa.visualization.modules import CanvasGrid
 from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.UserParam import Slider
 from mesa.visualization.modules import ChartModule
-from naming_model import minority_opinion, mixed_opinion
+from array_model import ArrayNamingModel
+from live_server import DiffGrid, LiveServer
 
-# Dimensions of the grid (number of cells x number of cells)
-width = 50
-height = 50
 # Arrays for slider initializations
 n_agents = [327, 100, 1000, 1]  # default, min, max, increment
 committed_f = [0.003, 0.001, 1.0, 0.001]
@@ -44,5 +43,35 @@ server = ModularServer(NamingModel,
                        "Naming Game with Groups",
                        {"n": number_of_agents_slider, "fraction": minority_fraction_slider,
                         "groups_size": groups_size_slider, "beta": beta_slider,
-                        "width": width, "height": height}
+                        "width": width, "height": height, "visualize": True}
                        )
+
+# Colors of the opinion codes in the live grid, the same of the chart
+opinion_colors = [None, "Blue", "Orange", "Red"]
+
+
+def cell_state(model):
+    if isinstance(model, ArrayNamingModel):
+        state = np.zeros(model.width*model.height, dtype=np.int8)
+        state[np.frombuffer(model.position, dtype=np.int64)] = np.frombuffer(model.opinion, dtype=np.int8)
+        return state
+    state = np.zeros(model.grid.width*model.grid.height, dtype=np.int8)
+    for agent in model.agents:
+        x, y = agent.pos
+        state[x*model.grid.height+y] = model.opinion[agent.unique_id]
+    return state
+
+
+def make_live_server(model_class=NamingModel, frame_steps=None, chunk_steps=1000):
+    """Server for long runs: the model runs in the background, chunk_steps updates at a time, and the grid is sent
+    only where it changed, every frame_steps updates or, if None, at the frame rate chosen in the page. Cells are
+    colored by opinion instead of highlighting the last group, and the series are kept in a ring buffer so that
+    memory stays bounded"""
+    live_grid = DiffGrid(cell_state, opinion_colors, width, height, 500, 500)
+    return LiveServer(model_class,
+                      [live_grid, opinions_graph],
+                      "Naming Game with Groups",
+                      {"n": number_of_agents_slider, "fraction": minority_fraction_slider,
+                       "groups_size": groups_size_slider, "beta": beta_slider,
+                       "width": width, "height": height, "collection": {"ring": True, "buffer_size": 1024}},
+                      frame_steps=frame_steps, chunk_steps=chunk_steps)
@@ -0,0 +1,82 @@
+import numpy as np
+from collector import StreamingCollector
+# The counts are indexed by the same codes of the array backend, so are its reporters
+from array_model import (speak, general_code, minority_code, chunk_size, minority_counter, general_counter,
+                         mixed_counter, only_one_opinion)
+
+
+class NetworkNamingModel:
+    """The advanced model on a contact network (see network.py) instead of a grid: each node is an agent and
+    agents don't move. At each step a random actor gathers a group breadth-first through the network and speaks
+    to it, with the same rules of NamingModel. The committed agents are random nodes"""
+    def __init__(self, network, fraction, beta, groups_size, seed=None, collection=None):
+        self.running = True
+        self.network = network
+        self.num_agents = n = network.num_nodes
+        self.committed_fraction = fraction
+        self.max_groups = groups_size
+        self.propensity = beta
+        self.rng = np.random.default_rng(seed)
+        num_committed = round(n*fraction)
+        num_general = n-num_committed
+        committed = np.zeros(n, dtype=bool)
+        committed[self.rng.choice(n, size=num_committed, replace=False)] = True
+        # Bytearrays like the array backend, speak reads and writes single items of them
+        self.committed = bytearray(committed.tobytes())
+        self.opinion = bytearray(np.where(committed, minority_code, general_code).astype(np.int8).tobytes())
+        # Number of agents holding each opinion, indexed by the opinion code
+        self.opinion_counts = [0, num_general, num_committed, 0]
+        # Agents involved in the last interaction, the first one is the speaker
+        self.mates = []
+        self.steps = 0
+        # Random numbers are drawn in chunks and consumed one actor at a time
+        self._draws = []
+        # Every step is kept in memory unless a dictionary with other arguments for the collector is given
+        self.datacollector = StreamingCollector({"Minority_Opinion": minority_counter,
+                                                 "General_Opinion": general_counter,
+                                                 "Mixed_Opinion": mixed_counter}, **(collection or {}))
+
+    def _refill_draws(self):
+        actors = self.rng.integers(0, self.num_agents, size=chunk_size)
+        uniforms = self.rng.random((chunk_size, 3))
+        # Reversed so that pop() returns them in the order they were drawn
+        self._draws = list(zip(actors.tolist(), uniforms.tolist()))[::-1]
+
+    def step(self):
+        if not self._draws:
+            self._refill_draws()
+        actor, (u_start, u_word, u_beta) = self._draws.pop()
+        self.mates = gather_group(self.network, actor, self.max_groups, u_start)
+        if len(self.mates) > 1:
+            speak(self, self.mates, u_word, u_beta)
+        self.steps += 1
+        self.datacollector.collect(self)
+
+    def run(self, k):
+        """Performs k asynchronous updates, same as calling step k times"""
+        for _ in range(k):
+            self.step()
+
+
+def gather_group(network, actor, max_groups, u_start):
+    """Breadth-first expansion from the actor through the network, until the group reaches max_groups agents or
+    there is no one else to reach. The neighbours of each node are visited starting from a random position, so
+    that the group is not always made of the same ones, and the cost is at most the degrees of the members"""
+    indptr = network.indptr
+    indices = network.indices
+    group = [actor]
+    seen = {actor}
+    # The group itself is the queue of the search
+    for node in group:
+        start = int(indptr[node])
+        degree = int(indptr[node+1])-start
+        offset = int(u_start*degree)
+        for i in range(degree):
+            mate = int(indices[start+(offset+i) % degree])
+            if mate in seen:
+                continue
+            seen.add(mate)
+            group.append(mate)
+            if len(group) >= max_groups:
+                return group
+    return group
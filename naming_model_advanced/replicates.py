@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import sys
+# Modules shared with the minimal model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+import naming_model
+import array_model
+
+# Implementations a replicate can run on, each one with its model class and reporters
+backends = {"mesa": (naming_model.NamingModel, naming_model),
+            "array": (array_model.ArrayNamingModel, array_model)}
+
+
+def run_replicate(params, seed, min_steps=100, max_steps=500000, backend="mesa"):
+    """Runs a single seeded model until only one opinion is left or max_steps is reached, the check for
+    consensus starts after min_steps. Returns the parameters, the seed, the consensus time (None if consensus
+    was never reached) and the final fractions of the three opinions"""
+    model_class, reporters = backends[backend]
+    # Only the final state is returned, a log-spaced series keeps the memory of long runs bounded
+    model = model_class(params["n"], params["fraction"], params["beta"], params["width"], params["height"],
+                        params["groups_size"], seed=seed, collection={"policy": "log"})
+    consensus_time = None
+    for i in range(1, max_steps+1):
+        model.step()
+        if i >= min_steps and reporters.only_one_opinion(model):
+            consensus_time = i
+            break
+    result = dict(params)
+    result.update({"seed": seed,
+                   "Consensus_Time": consensus_time,
+                   "Minority_Opinion": reporters.minority_counter(model),
+                   "General_Opinion": reporters.general_counter(model),
+                   "Mixed_Opinion": reporters.mixed_counter(model)})
+    return result
+
+
+def _run_replicate(job):
+    return run_replicate(*job)
+
+
+def parameter_points(parameters):
+    """Expands a dictionary of parameters, where each value is either a single value or a list of values, into
+    the list of all their combinations, the same way mesa.batch_run does"""
+    names = list(parameters)
+    values = [v if isinstance(v, (list, tuple, range)) else [v] for v in parameters.values()]
+    return [dict(zip(names, point)) for point in itertools.product(*values)]
+
+
+def run_replicates(parameters, replicates, min_steps=100, max_steps=500000, backend="mesa", base_seed=0,
+                   number_processes=None):
+    """Runs `replicates` seeded models for each combination of the parameters, spread over a pool of
+    number_processes workers (None uses all the cores). The i-th replicate of every parameter point is seeded
+    with base_seed+i. Returns a list with a result dictionary per replicate, in the order they were submitted"""
+    jobs = [(params, base_seed+i, min_steps, max_steps, backend)
+            for params in parameter_points(parameters) for i in range(replicates)]
+    return run_jobs(jobs, number_processes)
+
+
+def run_jobs(jobs, number_processes=None, pool=None):
+    """Runs a list of (params, seed, min_steps, max_steps, backend) replicates, see run_replicates. A pool with
+    number_processes workers can be given to reuse it among calls, otherwise one is started for these jobs"""
+    if not jobs:
+        return []
+    if number_processes == 1:
+        return [_run_replicate(job) for job in jobs]
+    workers = number_processes or os.cpu_count()
+    # Small chunks keep the workers busy even if consensus times are very different among replicates
+    chunksize = max(1, len(jobs)//(8*workers))
+    if pool is not None:
+        return list(pool.map(_run_replicate, jobs, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_replicate, jobs, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    import time
+    # Committed fractions around the tipping point, for the parameters of the benchmark article
+    params = {"n": 327, "fraction": [0.05, 0.1, 0.15], "beta": 0.336, "width": 50, "height": 50,
+              "groups_size": 5}
+    start_time = time.time()
+    results = run_replicates(params, replicates=8, max_steps=100000)
+    for result in results:
+        print(result)
+    print("--- %s seconds ---" % (time.time() - start_time))
@@ -0,0 +1,220 @@
+from multiprocessing import Pool
+import os
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from collector import StreamingCollector
+from array_model import (play, empty_cell, general_code, minority_code, minority_counter, general_counter,
+                         mixed_counter, only_one_opinion)
+
+# Domain-decomposed version of the array backend, for lattices too large for a single core. The torus is cut in
+# square tiles, the state lives in shared memory and the tiles are updated in parallel by a pool of processes.
+# A single update (move, group, speech) of an actor reads and writes only cells at distance at most groups_size
+# from where the actor was: one cell for the move and groups_size-1 for the chain of mates. With tiles wider than
+# 2*groups_size, two tiles of the same color of a 2x2 checkerboard never touch the same cells, so all of them can be
+# updated at the same time while the other three colors wait
+
+# Colors of the checkerboard, each step updates them one after the other in a random order
+tile_colors = [(0, 0), (1, 0), (0, 1), (1, 1)]
+# Tiles of each color the default tile side aims for, enough to keep this many processes busy in every phase
+tiles_per_color = 16
+
+
+def state_layout(shape, n):
+    # Length and item format of the lattice, the positions, the opinions and the commitments
+    width, height = shape[0], shape[1]
+    return [(width*height, "q"), (n, "q"), (n, "b"), (n, "?")]
+
+
+class SharedState:
+    """The arrays of the model in shared memory, plus what an update needs to know about the model. Workers attach
+    to the same segments by name, so no state is ever copied between processes. The arrays are memoryviews, like
+    the Python arrays of ArrayNamingModel they are fast to read and write one item at a time, np.asarray gives a
+    NumPy view of them for the operations on whole arrays"""
+    def __init__(self, shape, n, memories):
+        self.width, self.height, self.max_groups, self.propensity, self.tile_size = shape
+        # Segments can be larger than asked, the views are cut to the length of the arrays
+        views = [m.buf[:length*np.dtype(code).itemsize].cast(code)
+                 for (length, code), m in zip(state_layout(shape, n), memories)]
+        self.lattice, self.position, self.opinion, self.committed = views
+        self.memories = memories
+        # Changes of the opinion counts made by the updates of a tile, see update_tile
+        self.opinion_counts = [0, 0, 0, 0]
+
+    @classmethod
+    def create(cls, shape, n):
+        memories = []
+        try:
+            for length, code in state_layout(shape, n):
+                memories.append(SharedMemory(create=True, size=max(1, length*np.dtype(code).itemsize)))
+        except BaseException:
+            for m in memories:
+                m.close()
+                m.unlink()
+            raise
+        return cls(shape, n, memories)
+
+    @classmethod
+    def attach(cls, shape, n, names):
+        return cls(shape, n, [SharedMemory(name=name) for name in names])
+
+    def names(self):
+        return [m.name for m in self.memories]
+
+    def close(self, unlink=False):
+        # The views must be released before the memory they point to
+        for view in (self.lattice, self.position, self.opinion, self.committed):
+            view.release()
+        for m in self.memories:
+            m.close()
+            if unlink:
+                m.unlink()
+
+
+def update_tile(state, tile_x, tile_y, seed):
+    """Performs as many updates as the agents in the tile, each one on a random agent still in the tile. Returns the
+    changes of the opinion counts"""
+    size = state.tile_size
+    height = state.height
+    x0 = tile_x*size
+    y0 = tile_y*size
+    cells = (np.arange(x0, x0+size)[:, None]*height+np.arange(y0, y0+size)[None, :]).ravel()
+    occupants = np.asarray(state.lattice)[cells]
+    agents = occupants[occupants != empty_cell].tolist()
+    index = {a: i for i, a in enumerate(agents)}
+    state.opinion_counts = [0, 0, 0, 0]
+    for u_actor, u_move, u_word, u_beta in np.random.default_rng(seed).random((len(agents), 4)).tolist():
+        if not agents:
+            break
+        actor = agents[int(u_actor*len(agents))]
+        play(state, actor, u_move, u_word, u_beta)
+        x, y = divmod(state.position[actor], height)
+        if x0 <= x < x0+size and y0 <= y < y0+size:
+            continue
+        # An actor that left the tile belongs to a tile of another color and can't act again in this phase
+        i = index.pop(actor)
+        last = agents.pop()
+        if last != actor:
+            agents[i] = last
+            index[last] = i
+    return state.opinion_counts
+
+
+# State of a worker process, attached once when the pool starts
+_worker_state = None
+
+
+def _attach_worker(shape, n, names):
+    global _worker_state
+    _worker_state = SharedState.attach(shape, n, names)
+
+
+def _update_tile(task):
+    return update_tile(_worker_state, *task)
+
+
+def choose_tile_size(width, height, groups_size):
+    """Largest tile side that divides the lattice in an even number of tiles on both sides, is wider than
+    2*groups_size and still gives tiles_per_color tiles to each color. It doesn't depend on the number of
+    processes, since the tiles decide the result of a seed"""
+    valid = [t for t in range(2*groups_size+1, min(width, height)//2+1)
+             if width % t == 0 and height % t == 0 and (width//t) % 2 == 0 and (height//t) % 2 == 0]
+    if not valid:
+        raise ValueError("A %dx%d lattice can't be cut in tiles wider than %d" % (width, height, 2*groups_size))
+    busy = [t for t in valid if (width//t)*(height//t)//4 >= tiles_per_color]
+    return max(busy) if busy else min(valid)
+
+
+class TiledNamingModel:
+    """Parallel version of ArrayNamingModel for very large lattices, it takes the same parameters plus the tile
+    side and the number of processes (None uses all the cores, 1 runs in this process). A step is a sweep: every
+    tile performs as many updates as the agents it contains, so a step is about n updates of the other backends.
+    The result of a seed depends on the tile side but not on the number of processes. close() must be called when
+    done, or the model used in a with statement"""
+    def __init__(self, n, fraction, beta, width, height, groups_size, seed=None, collection=None, tile_size=None,
+                 processes=None):
+        self.running = True
+        self.num_agents = n
+        self.committed_fraction = fraction
+        self.max_groups = groups_size
+        self.propensity = beta
+        self.width = width
+        self.height = height
+        processes = processes or os.cpu_count()
+        if tile_size is None:
+            tile_size = choose_tile_size(width, height, groups_size)
+        elif tile_size <= 2*groups_size or width % (2*tile_size) != 0 or height % (2*tile_size) != 0:
+            raise ValueError("The tile side must be wider than 2*groups_size and the lattice must be cut in an even "
+                             "number of tiles on both sides")
+        self.tile_size = tile_size
+        self.tiles_x = width//tile_size
+        self.tiles_y = height//tile_size
+        self.rng = np.random.default_rng(seed)
+        self.steps = 0
+        self.processes = processes
+        self.pool = None
+        shape = (width, height, groups_size, beta, tile_size)
+        self.state = SharedState.create(shape, n)
+        try:
+            self.start(shape, n)
+        except BaseException:
+            # The segments would outlive the process otherwise. They can't be closed yet, the traceback keeps
+            # NumPy views of them alive, but once unlinked they go away with the last view
+            for m in self.state.memories:
+                m.unlink()
+            raise
+        self.datacollector = StreamingCollector({"Minority_Opinion": minority_counter,
+                                                 "General_Opinion": general_counter,
+                                                 "Mixed_Opinion": mixed_counter}, **(collection or {}))
+
+    def start(self, shape, n):
+        # Same initial state of ArrayNamingModel: committed agents are the last ones, on distinct random cells
+        num_committed = round(n*self.committed_fraction)
+        num_general = n-num_committed
+        lattice = np.asarray(self.state.lattice)
+        position = np.asarray(self.state.position)
+        committed = np.asarray(self.state.committed)
+        lattice[:] = empty_cell
+        position[:] = self.rng.choice(self.width*self.height, size=n, replace=False)
+        lattice[position] = np.arange(n)
+        committed[:] = False
+        committed[num_general:] = True
+        np.asarray(self.state.opinion)[:] = np.where(committed, minority_code, general_code)
+        self.opinion_counts = [0, num_general, num_committed, 0]
+        if self.processes > 1:
+            self.pool = Pool(self.processes, initializer=_attach_worker, initargs=(shape, n, self.state.names()))
+
+    def step(self):
+        for color in self.rng.permutation(len(tile_colors)):
+            cx, cy = tile_colors[color]
+            tiles = [(tx, ty) for tx in range(cx, self.tiles_x, 2) for ty in range(cy, self.tiles_y, 2)]
+            seeds = self.rng.integers(2**63, size=len(tiles)).tolist()
+            tasks = [(tx, ty, seed) for (tx, ty), seed in zip(tiles, seeds)]
+            if self.pool is None:
+                changes = [update_tile(self.state, *task) for task in tasks]
+            else:
+                changes = self.pool.map(_update_tile, tasks, chunksize=max(1, len(tasks)//(4*self.processes)))
+            for change in changes:
+                for code, delta in enumerate(change):
+                    self.opinion_counts[code] += delta
+        self.steps += 1
+        self.datacollector.collect(self)
+
+    def run(self, k):
+        for _ in range(k):
+            self.step()
+
+    def close(self):
+        if self.pool is not None:
+            # Between steps the workers have nothing left to do, and after an interrupted step waiting for them
+            # could hang
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self.state.close(unlink=True)
+        self.state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,167 @@
+import argparse
+import functools
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+# Modules shared with the minimal model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+import replicates
+
+# Adaptive search of the tipping point: the critical fraction of committed agents above which the minority opinion
+# wins. Instead of sweeping a grid of fractions, the search bisects the number of committed agents, and at each
+# probe it keeps adding batches of replicates only until it is clear on which side of the tipping point the probe
+# lies. Every replicate is stored in a cache on disk, so later searches reuse the runs of earlier ones
+
+# Modules whose source decides the outcome of a replicate on each backend
+backend_sources = {"mesa": ["naming_model", "occupancy", "replicates"],
+                   "array": ["array_model", "replicates"]}
+
+
+@functools.lru_cache(maxsize=None)
+def code_version(backend):
+    """Hash of the sources of the backend and of the library generating its random numbers, results computed
+    with a different version are never reused"""
+    digest = hashlib.sha256()
+    for name in backend_sources[backend]:
+        # Found the same way an import would, some of them are shared with the minimal model
+        with open(importlib.util.find_spec(name).origin, "rb") as f:
+            digest.update(f.read())
+    if backend == "mesa":
+        import mesa
+        digest.update(mesa.__version__.encode())
+    else:
+        digest.update(np.__version__.encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """Replicates already simulated, stored in a SQLite database. Each one is keyed by its parameters, seed, steps
+    limits, backend and code version"""
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT)")
+
+    @staticmethod
+    def key(job):
+        params, seed, min_steps, max_steps, backend = job
+        return json.dumps({"params": params, "seed": seed, "min_steps": min_steps, "max_steps": max_steps,
+                           "backend": backend, "version": code_version(backend)}, sort_keys=True)
+
+    def get(self, job):
+        row = self.connection.execute("SELECT result FROM results WHERE key = ?", (self.key(job),)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, job, result):
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (self.key(job), json.dumps(result)))
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def run_cached(jobs, cache, number_processes=None, pool=None):
+    """Results of the jobs, only the ones missing from the cache get simulated, in the given pool if any. Returns
+    the results, in the order of the jobs, and the number of simulated ones"""
+    results = [cache.get(job) for job in jobs]
+    missing = [i for i, result in enumerate(results) if result is None]
+    for i, result in zip(missing, replicates.run_jobs([jobs[i] for i in missing], number_processes, pool)):
+        cache.put(jobs[i], result)
+        results[i] = result
+    cache.commit()
+    return results, len(missing)
+
+
+def minority_won(result):
+    return result["Consensus_Time"] is not None and result["Minority_Opinion"] > result["General_Opinion"]
+
+
+def find_tipping_point(params, precision=0.01, lower=0.0, upper=0.5, batch=8, max_replicates=64, z=2.0,
+                       min_steps=100, max_steps=500000, backend="mesa", base_seed=0, cache_path="tipping_cache.db",
+                       number_processes=None):
+    """Critical committed fraction for the given n, beta, width, height and groups_size, that is the fraction where
+    the probability that the minority wins within max_steps crosses one half. The critical point must lie between
+    lower and upper, and the search stops when it is bracketed within precision (or within a single committed
+    agent). At each probe batches of replicates, seeded base_seed, base_seed+1 and so on, are added until the
+    share of minority wins is more than z standard errors away from one half, or max_replicates is reached.
+    Returns a dictionary with the estimate, the final bracket, every probe and the number of replicates
+    simulated and taken from the cache"""
+    n = params["n"]
+    cache = ResultCache(cache_path)
+    # A single pool for the whole search, starting one for every batch would cost more than a batch of short runs
+    pool = None if number_processes == 1 else ProcessPoolExecutor(max_workers=number_processes or os.cpu_count())
+    probes = []
+    counts = {"simulated": 0, "cached": 0}
+
+    def probe(committed):
+        # Fractions are snapped to a whole number of committed agents, so probes of different searches coincide
+        point = dict(params, fraction=committed/n)
+        wins = 0
+        done = 0
+        while done < max_replicates:
+            jobs = [(point, base_seed+i, min_steps, max_steps, backend)
+                    for i in range(done, min(done+batch, max_replicates))]
+            results, simulated = run_cached(jobs, cache, number_processes, pool)
+            counts["simulated"] += simulated
+            counts["cached"] += len(jobs)-simulated
+            wins += sum(minority_won(result) for result in results)
+            done += len(jobs)
+            if abs(wins/done-0.5) > z*0.5/math.sqrt(done):
+                break
+        probes.append({"fraction": point["fraction"], "wins": wins, "replicates": done})
+        return wins/done > 0.5
+
+    try:
+        low = math.floor(lower*n)
+        high = math.ceil(upper*n)
+        if probe(low) or not probe(high):
+            raise ValueError("The tipping point is not between fractions %g and %g" % (low/n, high/n))
+        while high-low > max(1, precision*n):
+            middle = (low+high)//2
+            if probe(middle):
+                high = middle
+            else:
+                low = middle
+    finally:
+        cache.close()
+        if pool is not None:
+            pool.shutdown()
+    return {"fraction": (low+high)/(2*n), "lower": low/n, "upper": high/n, "probes": probes, **counts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adaptive search of the critical fraction of committed agents")
+    parser.add_argument("--n", type=int, default=327, help="number of agents")
+    parser.add_argument("--beta", type=float, default=0.336, help="probability of agreeing on a shared word")
+    parser.add_argument("--width", type=int, default=50, help="width of the grid")
+    parser.add_argument("--height", type=int, default=50, help="height of the grid")
+    parser.add_argument("--groups-size", type=int, default=5, help="maximum size of a group, speaker included")
+    parser.add_argument("--precision", type=float, default=0.01, help="width of the final bracket")
+    parser.add_argument("--lower", type=float, default=0.0, help="fraction below the tipping point")
+    parser.add_argument("--upper", type=float, default=0.5, help="fraction above the tipping point")
+    parser.add_argument("--batch", type=int, default=8, help="replicates added at a time to a probe")
+    parser.add_argument("--max-replicates", type=int, default=64, help="maximum number of replicates of a probe")
+    parser.add_argument("--min-steps", type=int, default=100, help="steps before checking for consensus")
+    parser.add_argument("--max-steps", type=int, default=500000, help="maximum number of steps of a replicate")
+    parser.add_argument("--backend", choices=list(replicates.backends), default="array")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first replicate of every probe")
+    parser.add_argument("--cache", default="tipping_cache.db", help="SQLite file where replicates are stored")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, all the cores by default")
+    args = parser.parse_args(argv)
+    params = {"n": args.n, "beta": args.beta, "width": args.width, "height": args.height,
+              "groups_size": args.groups_size}
+    print(json.dumps(find_tipping_point(params, args.precision, args.lower, args.upper, args.batch,
+                                        args.max_replicates, min_steps=args.min_steps, max_steps=args.max_steps,
+                                        backend=args.backend, base_seed=args.seed, cache_path=args.cache,
+                                        number_processes=args.processes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
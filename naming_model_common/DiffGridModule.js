@@ -0,0 +1,40 @@
+// Canvas of the DiffGrid element of live_server.py: it keeps the picture of the previous frame and redraws only
+// the cells it receives
+const DiffGridModule = function (canvas_width, canvas_height, grid_width, grid_height, palette) {
+  const parent = document.createElement("div");
+  parent.style = `height:${canvas_height}px;`;
+  parent.className = "world-grid-parent";
+  const canvas = document.createElement("canvas");
+  Object.assign(canvas, { width: canvas_width, height: canvas_height, className: "world-grid" });
+  parent.appendChild(canvas);
+  document.getElementById("elements").appendChild(parent);
+
+  const context = canvas.getContext("2d");
+  const cellWidth = Math.floor(canvas_width / grid_width);
+  const cellHeight = Math.floor(canvas_height / grid_height);
+  // Same size of a circle with r=0.5 in CanvasGrid
+  const radius = 0.5 * (Math.min(cellWidth, cellHeight) / 2 - 1);
+
+  const drawCell = (cell, code) => {
+    const x = Math.floor(cell / grid_height);
+    const y = cell % grid_height;
+    // As in CanvasGrid, y grows upwards
+    const left = x * cellWidth;
+    const top = (grid_height - y - 1) * cellHeight;
+    context.clearRect(left, top, cellWidth, cellHeight);
+    if (code === 0) return;
+    context.beginPath();
+    context.arc(left + cellWidth / 2, top + cellHeight / 2, radius, 0, 2 * Math.PI);
+    context.fillStyle = palette[code];
+    context.fill();
+  };
+
+  this.render = (data) => {
+    if (data.full) context.clearRect(0, 0, canvas_width, canvas_height);
+    for (let i = 0; i < data.cells.length; i++) drawCell(data.cells[i], data.codes[i]);
+  };
+
+  this.reset = () => {
+    context.clearRect(0, 0, canvas_width, canvas_height);
+  };
+};
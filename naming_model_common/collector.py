@@ -0,0 +1,187 @@
+import math
+import os
+import shutil
+import numpy as np
+
+
+# Policies deciding at which steps the collector stores the reporters' values
+collection_policies = ["every", "log", "change"]
+
+
+class StreamingCollector:
+    """Alternative to Mesa's DataCollector for long runs. Only the steps selected by the policy get stored:
+    - "every": one step every `period` steps
+    - "log": about `points_per_decade` steps for each power of ten, so that both the transient and the long run
+      are visible with few points
+    - "change": only the steps where at least one of the values differs from the last stored ones
+    Values are kept in preallocated typed arrays. If a path is given, every time the arrays are full they get
+    appended to one binary file per column in that directory, otherwise they grow in memory (or, with ring=True,
+    only the last buffer_size rows are kept)"""
+    def __init__(self, model_reporters, policy="every", period=1, points_per_decade=20, buffer_size=65536,
+                 path=None, ring=False):
+        if policy not in collection_policies:
+            raise ValueError("Unknown collection policy %r, must be one of %s" % (policy, collection_policies))
+        self.model_reporters = model_reporters
+        self.columns = list(model_reporters)
+        self.policy = policy
+        self.period = period
+        self.points_per_decade = points_per_decade
+        self.ratio = 10**(1/points_per_decade)
+        self.buffer_size = buffer_size
+        self.path = path
+        self.ring = ring
+        # Number of times collect has been called, that is the step the values refer to
+        self.calls = 0
+        self.next_log_step = 0
+        self.last_values = None
+        self.steps = np.empty(buffer_size, dtype=np.int64)
+        self.values = np.empty((buffer_size, len(self.columns)), dtype=np.float64)
+        # Rows used in the buffer, and total number of rows stored since the beginning
+        self.size = 0
+        self.stored = 0
+        # Whether the files on disk belong to this collector yet, see flush and restore
+        self.started = False
+
+    def selected(self, step, values):
+        if self.policy == "every":
+            return step % self.period == 0
+        if self.policy == "log":
+            if step < self.next_log_step:
+                return False
+            self.next_log_step = max(step+1, math.ceil(step*self.ratio))
+            return True
+        return values != self.last_values
+
+    def collect(self, model):
+        step = self.calls
+        self.calls += 1
+        # With the "change" policy the reporters are needed to decide, otherwise they are evaluated only when
+        # the step gets stored
+        values = [self.model_reporters[name](model) for name in self.columns] if self.policy == "change" else None
+        if not self.selected(step, values):
+            return
+        if values is None:
+            values = [self.model_reporters[name](model) for name in self.columns]
+        self.last_values = values
+        if self.size == len(self.steps):
+            self.make_room()
+        row = self.size if not self.ring else self.stored % len(self.steps)
+        self.steps[row] = step
+        self.values[row] = values
+        self.stored += 1
+        self.size = min(self.size+1, len(self.steps))
+
+    def make_room(self):
+        if self.path is not None:
+            self.flush()
+        elif not self.ring:
+            self.steps = np.resize(self.steps, 2*len(self.steps))
+            self.values = np.resize(self.values, (2*len(self.values), len(self.columns)))
+
+    def flush(self):
+        """Appends the rows in the buffer to the files on disk and empties the buffer"""
+        if self.path is None:
+            return
+        if not self.started:
+            # Files are truncated the first time, a new collector starts a new series. This is not done when the
+            # collector is created, so that restore can keep the rows already on disk
+            os.makedirs(self.path, exist_ok=True)
+            for name in ["step"]+self.columns:
+                open(column_file(self.path, name), "wb").close()
+            self.started = True
+        if self.size == 0:
+            return
+        with open(column_file(self.path, "step"), "ab") as f:
+            self.steps[:self.size].tofile(f)
+        for i, name in enumerate(self.columns):
+            with open(column_file(self.path, name), "ab") as f:
+                np.ascontiguousarray(self.values[:self.size, i]).tofile(f)
+        self.size = 0
+
+    def buffered(self):
+        """Steps and values currently in memory, oldest first"""
+        if self.ring and self.stored > len(self.steps):
+            order = np.roll(np.arange(len(self.steps)), -(self.stored % len(self.steps)))
+            return self.steps[order], self.values[order]
+        return self.steps[:self.size], self.values[:self.size]
+
+    @property
+    def model_vars(self):
+        # Same layout of DataCollector.model_vars, so that chart modules can read the latest values
+        values = self.buffered()[1]
+        return {name: values[:, i] for i, name in enumerate(self.columns)}
+
+    def settings(self):
+        """Arguments needed to create an identical collector"""
+        return {"policy": self.policy, "period": self.period, "points_per_decade": self.points_per_decade,
+                "buffer_size": self.buffer_size, "path": self.path, "ring": self.ring}
+
+    def state(self):
+        """Everything needed to continue the collection exactly where it is, see restore. A series streamed to
+        disk stays in its files, the state only holds their path, so its size doesn't grow with the run"""
+        state = {"calls": self.calls, "next_log_step": self.next_log_step, "last_values": self.last_values,
+                 "stored": self.stored}
+        if self.path is None:
+            steps, values = self.buffered()
+            state.update(steps=steps.copy(), values=values.copy())
+        else:
+            self.flush()
+            state["path"] = self.path
+        return state
+
+    def restore(self, state):
+        """Continues the collection from a state returned by state(), the collector must have just been created
+        with the same settings, except for the path. The files of a streamed series are cut back to the rows it
+        had when the state was taken, or copied up to there if the path is a different one"""
+        self.calls = state["calls"]
+        self.next_log_step = state["next_log_step"]
+        self.last_values = state["last_values"]
+        # Only a series kept in memory has its rows in the state
+        steps = state.get("steps")
+        values = state.get("values")
+        if self.path is not None:
+            os.makedirs(self.path, exist_ok=True)
+            for name in ["step"]+self.columns:
+                source = column_file(state["path"], name)
+                target = column_file(self.path, name)
+                if not os.path.exists(target) or not os.path.samefile(source, target):
+                    shutil.copyfile(source, target)
+                # Steps and values take 8 bytes each
+                if os.path.getsize(target) < 8*state["stored"]:
+                    raise ValueError("%s has fewer rows than the collector had" % source)
+                os.truncate(target, 8*state["stored"])
+            self.started = True
+        elif self.ring:
+            # Each row goes back to the slot it had in the ring
+            rows = (state["stored"]-len(steps)+np.arange(len(steps))) % len(self.steps)
+            self.steps[rows] = steps
+            self.values[rows] = values
+            self.size = len(steps)
+        else:
+            while len(self.steps) < len(steps):
+                self.make_room()
+            self.steps[:len(steps)] = steps
+            self.values[:len(steps)] = values
+            self.size = len(steps)
+        self.stored = state["stored"]
+
+    def get_model_vars_dataframe(self):
+        # Imported here since pandas is only needed when the series gets converted
+        import pandas as pd
+        self.flush()
+        if self.path is not None:
+            return load_series(self.path, self.columns)
+        steps, values = self.buffered()
+        return pd.DataFrame(values, index=pd.Index(steps, name="step"), columns=self.columns)
+
+
+def column_file(path, name):
+    return os.path.join(path, name+(".i8" if name == "step" else ".f8"))
+
+
+def load_series(path, columns):
+    """Reads back a series written by a StreamingCollector"""
+    import pandas as pd
+    steps = np.fromfile(column_file(path, "step"), dtype=np.int64)
+    data = {name: np.fromfile(column_file(path, name), dtype=np.float64) for name in columns}
+    return pd.DataFrame(data, index=pd.Index(steps, name="step"))
@@ -0,0 +1,150 @@
+import os
+import queue
+import threading
+import time
+import traceback
+import numpy as np
+import tornado.escape
+import tornado.ioloop
+from mesa.visualization.ModularVisualization import ModularServer, SocketHandler, VisualizationElement
+
+# Live visualization for long runs. The model runs in a background thread at full speed and the page only gets a
+# frame when it asks for one, at the frame rate set in the page, or after every frame_steps steps. The grid is drawn
+# by DiffGrid, which sends only the cells that changed since the previous frame
+
+
+def advance(model, k):
+    if hasattr(model, "run"):
+        model.run(k)
+        return
+    for _ in range(k):
+        model.step()
+
+
+class LiveRunner:
+    """Background thread that owns the model: it steps it and renders the frames the page asks for, so the model
+    is never touched by two threads at once. With frame_steps=None it keeps running chunk_steps at a time between
+    frames, and it pauses when the page stops asking for frames for idle_timeout seconds; otherwise every frame
+    comes exactly frame_steps steps after the previous one. If stepping or rendering raises an exception, the model
+    is left alone and every frame asked afterwards is that exception"""
+    def __init__(self, model, render, frame_steps=None, chunk_steps=1, idle_timeout=2.0):
+        self.model = model
+        self.render = render
+        self.frame_steps = frame_steps
+        self.chunk_steps = chunk_steps
+        self.idle_timeout = idle_timeout
+        self.requests = queue.Queue()
+        self.frames = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def work(self):
+        # The page hasn't asked for anything yet, so the model waits
+        last_request = -self.idle_timeout
+        while True:
+            idle = (self.error is not None or self.frame_steps is not None or not self.model.running
+                    or time.monotonic()-last_request >= self.idle_timeout)
+            try:
+                request = self.requests.get(block=idle)
+            except queue.Empty:
+                # No one is waiting for a frame, the model keeps running
+                request = False
+            if request is False:
+                self.attempt(advance, self.model, self.chunk_steps)
+                continue
+            if request is None:
+                self.frames.put(None)
+                return
+            if self.frame_steps is not None and self.model.running:
+                self.attempt(advance, self.model, self.frame_steps)
+            frame = self.attempt(lambda: (self.model.running, self.render()))
+            # Even after a failure every request gets an answer, so that no one waits for a frame forever
+            self.frames.put(frame if self.error is None else self.error)
+            last_request = time.monotonic()
+
+    def attempt(self, function, *args):
+        """Calls function unless an earlier call failed, the first failure is printed and kept in self.error"""
+        if self.error is not None:
+            return None
+        try:
+            return function(*args)
+        except Exception as error:
+            traceback.print_exc()
+            self.error = error
+            return None
+
+    def frame(self):
+        """Blocks until the next frame is ready, None if the runner got stopped in the meantime, or the exception
+        that stopped the model"""
+        self.requests.put(True)
+        return self.frames.get()
+
+    def stop(self):
+        self.requests.put(None)
+        self.thread.join()
+
+
+class DiffGrid(VisualizationElement):
+    """Grid drawn from a single small integer per cell, given by cell_state(model) as an array of width*height
+    codes (cell x*height+y, 0 for an empty cell). Only the cells whose code changed since the last frame are sent,
+    the page draws each code as a circle of the color palette[code]. Diffs are taken against the last frame sent,
+    so the live server is meant to be watched from a single page"""
+    local_includes = ["DiffGridModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, cell_state, palette, grid_width, grid_height, canvas_width=500, canvas_height=500):
+        self.cell_state = cell_state
+        self.previous = None
+        self.model = None
+        self.js_code = "elements.push(new DiffGridModule(%d, %d, %d, %d, %s));" % (
+            canvas_width, canvas_height, grid_width, grid_height, tornado.escape.json_encode(palette))
+
+    def render(self, model):
+        state = self.cell_state(model)
+        full = model is not self.model
+        changed = np.flatnonzero(state) if full else np.flatnonzero(state != self.previous)
+        self.model = model
+        self.previous = state
+        return {"full": full, "cells": changed.tolist(), "codes": state[changed].tolist()}
+
+
+class LiveSocketHandler(SocketHandler):
+    """Same protocol of Mesa's handler, but a request for the next step gets the latest frame of the runner
+    instead of stepping the model"""
+    async def on_message(self, message):
+        msg = tornado.escape.json_decode(message)
+        if msg["type"] != "get_step":
+            super().on_message(message)
+            return
+        # Waiting for the frame in another thread keeps the server responsive
+        frame = await tornado.ioloop.IOLoop.current().run_in_executor(None, self.application.runner.frame)
+        if frame is None:
+            return
+        if isinstance(frame, Exception):
+            # The traceback is printed by the runner, the page just stops asking for steps
+            self.write_message({"type": "end"})
+            return
+        running, data = frame
+        if running:
+            self.write_message({"type": "viz_state", "data": data})
+        else:
+            self.write_message({"type": "end"})
+
+
+class LiveServer(ModularServer):
+    """ModularServer whose model runs in a LiveRunner"""
+    def __init__(self, model_cls, visualization_elements, name="Mesa Model", model_params=None, port=None,
+                 frame_steps=None, chunk_steps=1):
+        self.frame_steps = frame_steps
+        self.chunk_steps = chunk_steps
+        self.runner = None
+        super().__init__(model_cls, visualization_elements, name, model_params, port)
+        # Added handlers are matched before the ones given to the constructor
+        self.add_handlers(r".*", [(r"/ws", LiveSocketHandler)])
+
+    def reset_model(self):
+        if self.runner is not None:
+            self.runner.stop()
+        super().reset_model()
+        self.runner = LiveRunner(self.model, self.render_model, self.frame_steps, self.chunk_steps)
@@ -0,0 +1,122 @@
+import numpy as np
+
+# Contact networks for the naming game, stored as CSR adjacency arrays: two integer arrays whatever the size of the
+# graph, and the neighbours of a node are a slice of one of them. Generators are vectorized, so networks with
+# millions of nodes and tens of millions of edges are built without Python loops over the edges
+
+
+class Network:
+    """Undirected graph without self loops nor repeated edges. The neighbours of node i are
+    indices[indptr[i]:indptr[i+1]]"""
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+        self.num_nodes = len(indptr)-1
+        self.num_edges = len(indices)//2
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def neighbours(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node+1]]
+
+    def random_neighbours(self, nodes, rng):
+        """A uniformly random neighbour for each of the nodes, which must not be isolated"""
+        starts = self.indptr[nodes]
+        degrees = self.indptr[nodes+1]-starts
+        return self.indices[starts+(rng.random(len(nodes))*degrees).astype(np.int64)]
+
+
+def from_edges(n, sources, targets):
+    """Network with n nodes and the given edges, in any direction. Self loops and repeated edges are dropped"""
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    keep = sources != targets
+    sources = sources[keep]
+    targets = targets[keep]
+    # Each edge is stored in both directions, sorted by source and then by target through a single key
+    keys = np.concatenate([sources*n+targets, targets*n+sources])
+    del sources, targets, keep
+    keys.sort()
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(keys//n, minlength=n), out=indptr[1:])
+    indices = (keys % n).astype(np.int32 if n < 2**31 else np.int64)
+    return Network(indptr, indices)
+
+
+def lattice(width, height):
+    """Torus where each node x*height+y is linked to the eight nodes around it, like the cells of the grids"""
+    x, y = np.divmod(np.arange(width*height, dtype=np.int64), height)
+    sources = []
+    targets = []
+    # Half of the Moore neighbourhood is enough, edges are stored in both directions
+    for dx, dy in [(1, -1), (1, 0), (1, 1), (0, 1)]:
+        sources.append(x*height+y)
+        targets.append(((x+dx) % width)*height+(y+dy) % height)
+    return from_edges(width*height, np.concatenate(sources), np.concatenate(targets))
+
+
+def small_world(n, k, p, seed=None):
+    """Watts-Strogatz graph: a ring where each node is linked to the k nearest ones (k/2 on each side), then the
+    far end of each edge is moved to a random node with probability p. Edges rewired onto a self loop or an
+    existing edge are dropped"""
+    rng = np.random.default_rng(seed)
+    nodes = np.arange(n, dtype=np.int64)
+    sources = np.concatenate([nodes]*(k//2))
+    targets = np.concatenate([(nodes+j) % n for j in range(1, k//2+1)])
+    rewired = rng.random(len(targets)) < p
+    targets[rewired] = rng.integers(n, size=int(rewired.sum()))
+    return from_edges(n, sources, targets)
+
+
+def erdos_renyi(n, mean_degree, seed=None):
+    """Random graph with about n*mean_degree/2 edges between uniformly random couples of nodes"""
+    rng = np.random.default_rng(seed)
+    m = round(n*mean_degree/2)
+    return from_edges(n, rng.integers(n, size=m), rng.integers(n, size=m))
+
+
+def scale_free(n, exponent=2.5, min_degree=2, seed=None):
+    """Configuration model with degrees drawn from a power law P(k) ~ k^-exponent, k >= min_degree, cut at sqrt(n)
+    so that few repeated edges get dropped. The stubs of the nodes are paired at random"""
+    rng = np.random.default_rng(seed)
+    degrees = np.floor(min_degree*(1-rng.random(n))**(-1/(exponent-1))).astype(np.int64)
+    np.minimum(degrees, max(min_degree, int(np.sqrt(n))), out=degrees)
+    if degrees.sum() % 2:
+        degrees[0] += 1
+    stubs = np.repeat(np.arange(n, dtype=np.int64), degrees)
+    rng.shuffle(stubs)
+    return from_edges(n, stubs[0::2], stubs[1::2])
+
+
+def load_edge_list(path):
+    """Network read from a text file with an edge per line, as two node labels separated by spaces or tabs. Lines
+    starting with # are skipped. Labels can be any integers, nodes are numbered in increasing order of label"""
+    # Imported here since pandas is only needed to read edge lists
+    import pandas as pd
+    edges = pd.read_csv(path, sep=r"\s+", comment="#", header=None, usecols=[0, 1], dtype=np.int64).values
+    labels, ends = np.unique(edges, return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    return from_edges(len(labels), ends[:, 0], ends[:, 1])
+
+
+# Kinds of generated networks, see make_network
+network_kinds = ["lattice", "small_world", "erdos_renyi", "scale_free"]
+
+
+def make_network(kind, n, degree=8, width=None, height=None, seed=None):
+    """A generated network of the given kind with about n nodes and mean degree about degree (the minimum degree
+    for scale_free), or the edge list in the file kind. A lattice is width x height, or the largest square with at
+    most n nodes"""
+    if kind == "lattice":
+        if width is None or height is None:
+            width = height = int(np.sqrt(n))
+        return lattice(width, height)
+    if kind == "small_world":
+        return small_world(n, degree, 0.1, seed)
+    if kind == "erdos_renyi":
+        return erdos_renyi(n, degree, seed)
+    if kind == "scale_free":
+        return scale_free(n, min_degree=degree, seed=seed)
+    return load_edge_list(kind)
@@ -0,0 +1,62 @@
+from array import array
+
+
+# Relative positions of the Moore neighbourhood, in the same order Mesa visits them
+moore_offsets = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+
+class Occupancy:
+    """Number of agents in each cell of a toroidal grid, together with the index of the cells that still have
+    room for another agent. Cells are numbered x*height+y; the free cells are kept in a list, and each cell
+    knows its place in that list, so that adding, removing and drawing a random free cell are all O(1)"""
+    def __init__(self, width, height, capacity):
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.counts = bytearray(width*height)
+        self.free = array("q", range(width*height))
+        self.index = array("q", range(width*height))
+
+    def count(self, pos):
+        return self.counts[pos[0]*self.height+pos[1]]
+
+    def has_room(self, pos):
+        return self.counts[pos[0]*self.height+pos[1]] < self.capacity
+
+    def add(self, pos):
+        cell = pos[0]*self.height+pos[1]
+        self.counts[cell] += 1
+        if self.counts[cell] == self.capacity:
+            self._drop_free(cell)
+
+    def remove(self, pos):
+        cell = pos[0]*self.height+pos[1]
+        if self.counts[cell] == self.capacity:
+            self.index[cell] = len(self.free)
+            self.free.append(cell)
+        self.counts[cell] -= 1
+
+    def move(self, old_pos, new_pos):
+        self.remove(old_pos)
+        self.add(new_pos)
+
+    def _drop_free(self, cell):
+        # The last free cell takes the place of the removed one
+        i = self.index[cell]
+        last = self.free.pop()
+        if last != cell:
+            self.free[i] = last
+            self.index[last] = i
+        self.index[cell] = -1
+
+    def random_free_cell(self, rng):
+        """A uniformly random cell with room for another agent, None if the grid is full"""
+        if not self.free:
+            return None
+        return divmod(self.free[rng.randrange(len(self.free))], self.height)
+
+    def free_neighbours(self, pos):
+        """The cells of the Moore neighbourhood of pos with room for another agent"""
+        x, y = pos
+        cells = [((x+dx) % self.width, (y+dy) % self.height) for dx, dy in moore_offsets]
+        return [c for c in cells if self.counts[c[0]*self.height+c[1]] < self.capacity]
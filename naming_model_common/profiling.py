@@ -0,0 +1,44 @@
+import time
+from collections import Counter, defaultdict
+
+
+class PhaseProfiler:
+    """Opt-in instrumentation of a model: counters of what happens during the steps (moves, failed moves,
+    interactions and their outcomes, sizes of the groups) and the time spent in each phase of a step. A model
+    only pays for it when a profiler is given, otherwise the hooks are skipped with a single check.
+    If a sink is given, it gets called with a snapshot every sink_every steps"""
+    def __init__(self, sink=None, sink_every=1000):
+        self.sink = sink
+        self.sink_every = sink_every
+        self.reset()
+
+    def reset(self):
+        self.steps = 0
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(float)
+        self.group_sizes = Counter()
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def add_time(self, name, start):
+        # Adds the time elapsed since start to the phase, and returns the current time so that consecutive
+        # phases can be chained
+        now = time.perf_counter()
+        self.timings[name] += now-start
+        return now
+
+    def group(self, size):
+        self.group_sizes[size] += 1
+
+    def end_step(self):
+        self.steps += 1
+        if self.sink is not None and self.steps % self.sink_every == 0:
+            self.sink(self.snapshot())
+
+    def snapshot(self):
+        """Plain dictionary with the totals since the last reset"""
+        return {"steps": self.steps,
+                "counters": dict(self.counters),
+                "timings": dict(self.timings),
+                "group_sizes": dict(sorted(self.group_sizes.items()))}
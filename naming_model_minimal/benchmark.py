@@ -0,0 +1,154 @@
+import argparse
+import json
+import platform
+import time
+import os
+import sys
+# Modules shared with the advanced model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+import naming_model
+import mean_field
+from profiling import PhaseProfiler
+
+# Seeded benchmark suite of the minimal model. It measures the step throughput and the wall-clock time to
+# consensus on a set of parameter points, and how the time of a step of the Mesa model splits among its phases.
+# Results are written as JSON and can be compared against a stored baseline to catch regressions
+
+# Parameter points for the throughput measurements, they vary the number of agents, the grid size and therefore
+# the density
+throughput_suite = [
+    {"name": "article", "n": 400, "width": 30, "height": 30, "random_interactions": False},
+    {"name": "saturated", "n": 1700, "width": 30, "height": 30, "random_interactions": False},
+    {"name": "large_grid", "n": 4000, "width": 100, "height": 100, "random_interactions": False},
+    {"name": "random_interactions", "n": 400, "width": 30, "height": 30, "random_interactions": True},
+]
+consensus_suite = [
+    {"name": "article", "n": 400, "width": 30, "height": 30, "random_interactions": False},
+    {"name": "random_interactions", "n": 400, "width": 30, "height": 30, "random_interactions": True},
+]
+
+
+def make_model(params, backend, seed):
+    # Only the final state matters here, a log-spaced series keeps the collection cheap and bounded
+    collection = {"policy": "log"}
+    if backend == "mean_field":
+        return mean_field.MeanFieldNamingModel(params["n"], seed=seed, collection=collection)
+    return naming_model.NamingModel(params["n"], params["width"], params["height"], collection=collection,
+                                    random_interactions=params["random_interactions"], seed=seed)
+
+
+def backends_for(params, backends_to_run):
+    # The mean-field model only makes sense for random interactions
+    return [b for b in backends_to_run if b == "mesa" or params["random_interactions"]]
+
+
+def measure_throughput(params, backend, seed, steps, warmup):
+    model = make_model(params, backend, seed)
+    for _ in range(warmup):
+        model.step()
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.step()
+    return steps/(time.perf_counter()-start)
+
+
+def measure_consensus(params, backend, seed, max_steps):
+    module = mean_field if backend == "mean_field" else naming_model
+    model = make_model(params, backend, seed)
+    start = time.perf_counter()
+    for i in range(1, max_steps+1):
+        model.step()
+        if module.only_one_word(model):
+            return i, time.perf_counter()-start
+    return None, time.perf_counter()-start
+
+
+def measure_phases(params, seed, steps, warmup):
+    """Average time per step spent moving, choosing the hearer, speaking and collecting data in the Mesa
+    model"""
+    model = make_model(params, "mesa", seed)
+    for _ in range(warmup):
+        model.step()
+    # The profiler is attached after the warmup, so that only the measured steps are instrumented
+    model.profiler = PhaseProfiler()
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.step()
+    total = time.perf_counter()-start
+    phases = {name: value/steps for name, value in model.profiler.timings.items()}
+    phases["total"] = total/steps
+    return phases
+
+
+def run_suite(backends_to_run, quick=False, seed=0):
+    steps = 20 if quick else 200
+    warmup = 5 if quick else 20
+    max_steps = 2000 if quick else 20000
+    results = []
+    for params in throughput_suite:
+        for backend in backends_for(params, backends_to_run):
+            result = {"kind": "throughput", "backend": backend, "seed": seed}
+            result.update(params)
+            result["steps_per_second"] = measure_throughput(params, backend, seed, steps, warmup)
+            if backend == "mesa":
+                result["phases"] = measure_phases(params, seed, steps, warmup)
+            results.append(result)
+            print("%-11s %-20s %-10s %10.1f steps/s" % ("throughput", params["name"], backend,
+                                                        result["steps_per_second"]))
+    for params in consensus_suite:
+        for backend in backends_for(params, backends_to_run):
+            result = {"kind": "consensus", "backend": backend, "seed": seed}
+            result.update(params)
+            result["consensus_steps"], result["consensus_seconds"] = measure_consensus(params, backend, seed,
+                                                                                       max_steps)
+            results.append(result)
+            print("%-11s %-20s %-10s %10.2f s (%s steps)" % ("consensus", params["name"], backend,
+                                                             result["consensus_seconds"], result["consensus_steps"]))
+    return {"python": platform.python_version(), "machine": platform.machine(), "quick": quick,
+            "results": results}
+
+
+def compare(report, baseline, tolerance):
+    """Returns the list of measurements that got worse than the baseline by more than the tolerance"""
+    reference = {(r["kind"], r["name"], r["backend"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = reference.get((result["kind"], result["name"], result["backend"]))
+        if old is None:
+            continue
+        if result["kind"] == "throughput":
+            ratio = result["steps_per_second"]/old["steps_per_second"]
+        else:
+            ratio = old["consensus_seconds"]/result["consensus_seconds"]
+        if ratio < 1-tolerance:
+            regressions.append("%s %s %s: %.0f%% of the baseline speed" % (result["kind"], result["name"],
+                                                                         result["backend"], 100*ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark suite of the minimal naming game")
+    parser.add_argument("--backend", choices=["mesa", "mean_field", "both"], default="both")
+    parser.add_argument("--quick", action="store_true", help="fewer steps, for a fast check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file where the results are written")
+    parser.add_argument("--baseline", default=None, help="JSON file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown with respect to the baseline that counts as a regression")
+    args = parser.parse_args(argv)
+    backends_to_run = ["mesa", "mean_field"] if args.backend == "both" else [args.backend]
+    report = run_suite(backends_to_run, args.quick, args.seed)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
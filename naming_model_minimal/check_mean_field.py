@@ -0,0 +1,59 @@
+import numpy as np
+import os
+import sys
+# Modules shared with the advanced model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+from naming_model import NamingModel
+from mean_field import MeanFieldNamingModel
+
+# Statistical check of the vectorized mean-field model against NamingModel with random interactions: we run
+# independent replicates of both and compare the height and position of the peak of Total_Words, Different_Words
+# and Prob_Success after some steps, and the convergence time, with a two sample z test
+n_agents = 400
+replicates = 12
+num_steps = 150
+# Steps after which Different_Words and Prob_Success are compared
+check_steps = [5, 20, 50]
+# Largest z score we accept, above this value the two implementations are considered different
+max_z = 3.0
+
+
+def curve_summary(model):
+    for _ in range(num_steps):
+        model.step()
+    df = model.datacollector.get_model_vars_dataframe()
+    total = df["Total_Words"].values
+    different = df["Different_Words"].values
+    success = df["Prob_Success"].values
+    converged = np.flatnonzero((total == n_agents) & (different == 1))
+    # Row i is collected after step i+1
+    return ([total.max(), total.argmax(), converged[0] if len(converged) > 0 else num_steps]
+            + [different[s-1] for s in check_steps] + [success[s-1] for s in check_steps])
+
+
+labels = (["Peak of Total_Words", "Step of the peak", "Convergence step"]
+          + ["Different_Words at step %d" % s for s in check_steps]
+          + ["Prob_Success at step %d" % s for s in check_steps])
+
+
+mesa_results = []
+vectorized_results = []
+for seed in range(replicates):
+    mesa_results.append(curve_summary(NamingModel(n_agents, 30, 30, random_interactions=True, seed=seed)))
+    vectorized_results.append(curve_summary(MeanFieldNamingModel(n_agents, seed=seed)))
+
+mesa_results = np.array(mesa_results, dtype=float)
+vectorized_results = np.array(vectorized_results, dtype=float)
+equivalent = True
+for i, label in enumerate(labels):
+    mean_mesa = mesa_results[:, i].mean()
+    mean_vectorized = vectorized_results[:, i].mean()
+    std_err = np.sqrt((mesa_results[:, i].var(ddof=1)+vectorized_results[:, i].var(ddof=1))/replicates)
+    z = abs(mean_mesa-mean_vectorized)/std_err if std_err > 0 else 0.0
+    print("%s: mesa %.3f, vectorized %.3f, z = %.2f" % (label, mean_mesa, mean_vectorized, z))
+    if z > max_z:
+        equivalent = False
+
+print("Equivalent" if equivalent else "NOT equivalent")
+if not equivalent:
+    raise SystemExit(1)
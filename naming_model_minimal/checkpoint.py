@@ -0,0 +1,116 @@
+from array import array
+from collections import Counter
+import json
+import numpy as np
+from collector import StreamingCollector
+from naming_model import NamingModel
+
+# Checkpoints of the minimal model: the whole state of a NamingModel (positions, inventories, random generator and
+# the series collected so far) is saved in a single compressed NumPy archive. A model loaded from a checkpoint
+# continues exactly as the original one would have, so many continuations can be forked from the same state
+
+
+def random_state_arrays(rng):
+    """The state of a random.Random as arrays"""
+    version, internal, gauss_next = rng.getstate()
+    return {"rng_version": np.array(version), "rng_internal": np.array(internal, dtype=np.uint32),
+            "rng_gauss_next": np.array(np.nan if gauss_next is None else gauss_next)}
+
+
+def random_state_from_arrays(data):
+    gauss_next = float(data["rng_gauss_next"])
+    return (int(data["rng_version"]), tuple(int(v) for v in data["rng_internal"]),
+            None if np.isnan(gauss_next) else gauss_next)
+
+
+def series_arrays(datacollector):
+    """The series collected so far, together with what is needed to continue the collection"""
+    if isinstance(datacollector, StreamingCollector):
+        state = datacollector.state()
+        arrays = {"collector_streaming": np.array(True),
+                  "collector_settings": np.array(json.dumps(datacollector.settings())),
+                  "collector_counters": np.array([state["calls"], state["next_log_step"], state["stored"]]),
+                  "collector_last_values": np.array(state["last_values"] if state["last_values"] is not None
+                                                    else [], dtype=np.float64)}
+        # A series streamed to disk stays in its files, see StreamingCollector.state
+        if "steps" in state:
+            arrays.update(series_steps=state["steps"], series_values=state["values"])
+        return arrays
+    # One array per reporter, so that each column keeps its type
+    series = {"series_"+name: np.array(values) for name, values in datacollector.model_vars.items()}
+    return {"collector_streaming": np.array(False), **series}
+
+
+def restore_series(model, data):
+    if not bool(data["collector_streaming"]):
+        for name in model.datacollector.model_reporters:
+            model.datacollector.model_vars[name] = data["series_"+name].tolist()
+        return
+    calls, next_log_step, stored = (int(v) for v in data["collector_counters"])
+    last_values = data["collector_last_values"].tolist()
+    state = {"calls": calls, "next_log_step": next_log_step, "last_values": last_values if last_values else None,
+             "stored": stored}
+    if "series_steps" in data:
+        state.update(steps=data["series_steps"], values=data["series_values"])
+    else:
+        state["path"] = json.loads(str(data["collector_settings"]))["path"]
+    model.datacollector.restore(state)
+
+
+def collection_settings(data, collection_path):
+    if not bool(data["collector_streaming"]):
+        return None
+    settings = json.loads(str(data["collector_settings"]))
+    # A series streamed to disk continues in its old directory, cut back to the checkpoint, unless a new one is
+    # given, where the rows up to the checkpoint get copied
+    if settings["path"] is not None and collection_path is not None:
+        settings["path"] = collection_path
+    return settings
+
+
+def save_checkpoint(model, path):
+    agents = sorted(model.agents, key=lambda a: a.unique_id)
+    inventories = [a.inventory for a in agents]
+    np.savez_compressed(
+        path,
+        params=np.array([model.num_agents, model.grid.width, model.grid.height, model.random_interactions]),
+        positions=np.array([a.pos for a in agents], dtype=np.int32),
+        will_listen=np.array([a.will_listen for a in agents], dtype=bool),
+        # Inventories are written one after the other, with their lengths to split them back
+        inventory_words=np.concatenate([np.frombuffer(i, dtype=np.int64) for i in inventories]
+                                       + [np.zeros(0, dtype=np.int64)]),
+        inventory_lengths=np.array([len(i) for i in inventories], dtype=np.int64),
+        counters=np.array([model.next_word_id, model.num_interactions, model.successful_interactions,
+                           model.schedule.steps, model.schedule.time]),
+        **random_state_arrays(model.random),
+        **series_arrays(model.datacollector))
+
+
+def load_checkpoint(path, collection_path=None, profiler=None):
+    """Rebuilds the model saved in path. If the series was streamed to disk, collection_path gives the directory
+    where it continues, so that forks of the same checkpoint don't write on each other's files"""
+    with np.load(path) as data:
+        n, width, height, random_interactions = (int(v) for v in data["params"])
+        model = NamingModel(n, width, height, collection=collection_settings(data, collection_path),
+                            random_interactions=bool(random_interactions), profiler=profiler)
+        agents = sorted(model.agents, key=lambda a: a.unique_id)
+        # All the agents leave the grid before being placed again, so that cells never overflow
+        for a in agents:
+            model.occupancy.remove(a.pos)
+            model.grid.remove_agent(a)
+        words = data["inventory_words"]
+        ends = np.cumsum(data["inventory_lengths"])
+        for a, pos, will_listen, end, length in zip(agents, data["positions"], data["will_listen"], ends,
+                                                    data["inventory_lengths"]):
+            pos = (int(pos[0]), int(pos[1]))
+            model.occupancy.add(pos)
+            model.grid.place_agent(a, pos)
+            a.will_listen = bool(will_listen)
+            a.inventory = array("q", words[end-length:end].tolist())
+        model.global_inventory = Counter(words.tolist())
+        model.total_words = len(words)
+        (model.next_word_id, model.num_interactions, model.successful_interactions, model.schedule.steps,
+         model.schedule.time) = (int(v) for v in data["counters"])
+        model.random.setstate(random_state_from_arrays(data))
+        restore_series(model, data)
+    return model
@@ -0,0 +1,91 @@
+import argparse
+import json
+import time
+import os
+import sys
+# Modules shared with the advanced model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
+from collector import collection_policies
+from mean_field import default_rounds
+
+# Headless entry point of the minimal model: only the simulation core gets imported, the server and matplotlib are
+# imported only when --serve or --plot ask for them
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the minimal naming game without a browser")
+    parser.add_argument("--n", type=int, default=400, help="number of agents")
+    parser.add_argument("--width", type=int, default=30, help="width of the grid")
+    parser.add_argument("--height", type=int, default=30, help="height of the grid")
+    parser.add_argument("--random-interactions", action="store_true",
+                        help="agents talk to random agents instead of their cellmates")
+    parser.add_argument("--mean-field", action="store_true",
+                        help="use the vectorized mean-field model (implies random interactions, ignores the grid)")
+    parser.add_argument("--network", default=None,
+                        help="play on a contact network, vectorized like --mean-field: lattice (the largest square "
+                             "with at most n nodes), small_world, erdos_renyi, scale_free or the path of an edge list")
+    parser.add_argument("--rounds", type=int, default=default_rounds,
+                        help="with --mean-field or --network, batches of disjoint couples in a step")
+    parser.add_argument("--degree", type=int, default=8,
+                        help="with --network, mean degree of the generated network (minimum degree for scale_free)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=10000, help="maximum number of steps")
+    parser.add_argument("--min-steps", type=int, default=1, help="steps before checking for consensus")
+    parser.add_argument("--output", default=None,
+                        help="directory where the collected series is written, one binary file per column")
+    parser.add_argument("--policy", choices=collection_policies, default="every", help="collection policy")
+    parser.add_argument("--period", type=int, default=1, help="steps between collections with the every policy")
+    parser.add_argument("--plot", action="store_true", help="plot the collected series at the end")
+    parser.add_argument("--serve", action="store_true", help="launch the visualization server instead")
+    parser.add_argument("--live", action="store_true",
+                        help="with --serve, run the model in the background and send only the changed cells")
+    parser.add_argument("--frame-steps", type=int, default=None,
+                        help="with --live, steps between frames instead of following the frame rate of the page")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        if args.live:
+            from naming_server import make_live_server
+            server = make_live_server(args.frame_steps)
+        else:
+            from naming_server import server
+        server.port = 8521
+        server.launch()
+        return
+    collection = {"policy": args.policy, "period": args.period, "path": args.output}
+    if args.network is not None:
+        import network
+        import network_model as core
+        graph = network.make_network(args.network, args.n, args.degree, seed=args.seed)
+        model = core.NetworkNamingModel(graph, seed=args.seed, collection=collection, rounds=args.rounds)
+    elif args.mean_field:
+        import mean_field as core
+        model = core.MeanFieldNamingModel(args.n, seed=args.seed, collection=collection, rounds=args.rounds)
+    else:
+        import naming_model as core
+        model = core.NamingModel(args.n, args.width, args.height, collection=collection,
+                                 random_interactions=args.random_interactions, seed=args.seed)
+    start_time = time.time()
+    consensus_time = None
+    for i in range(1, args.steps+1):
+        model.step()
+        if i >= args.min_steps and core.only_one_word(model):
+            consensus_time = i
+            break
+    model.datacollector.flush()
+    # A single line of JSON, easy to gather from many jobs
+    print(json.dumps({"n": model.num_agents, "seed": args.seed, "Consensus_Time": consensus_time,
+                      "Total_Words": core.calculate_total_words(model),
+                      "Different_Words": core.calculate_different_words(model),
+                      "seconds": time.time()-start_time}))
+    if args.plot:
+        import matplotlib.pyplot as plt
+        model.datacollector.get_model_vars_dataframe().plot(subplots=True)
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import os
+import sys
+# Modules shared with the advanced model are in naming_model_common, next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "naming_model_common"))
 from naming_server import server
 server.port = 8521
 server.launch()
@@ -0,0 +1,126 @@
+import numpy as np
+from collector import StreamingCollector
+
+
+# Value of the unused slots of the inventories
+no_word = -1
+# Batches of a step, with this many check_mean_field.py finds the curves of NamingModel. With fewer batches the
+# early steps are visibly different
+default_rounds = 64
+
+
+class MeanFieldNamingModel:
+    """Vectorized version of the minimal model with random interactions (the well-mixed game of the article).
+    Inventories are rows of an integer matrix. As in a step of NamingModel with random_interactions=True every
+    agent speaks once, in random order, to a random hearer; the speakers are split into `rounds` consecutive
+    batches, and the couples of a batch are disjoint, so that they all interact at once. The more rounds, the
+    closer the result is to one interaction at a time"""
+    def __init__(self, n, seed=None, collection=None, rounds=default_rounds):
+        self.running = True
+        self.num_agents = n
+        # Each batch of speakers needs as many distinct hearers among the other agents, so there are at least two
+        # rounds, and more if the largest batch would be more than half of the agents
+        self.rounds = max(2, rounds)
+        while self.rounds < n and 2*-(-n//self.rounds) > n:
+            self.rounds += 1
+        self.rng = np.random.default_rng(seed)
+        # Row i holds the word ids known by agent i in its first sizes[i] slots
+        self.inventory = np.full((n, 4), no_word, dtype=np.int32)
+        self.sizes = np.zeros(n, dtype=np.int32)
+        # Number of agents knowing each word id
+        self.word_counts = np.zeros(n, dtype=np.int64)
+        self.next_word_id = 0
+        # Members to calculate the probability of success in the interactions
+        self.num_interactions = 0
+        self.successful_interactions = 0
+        # Every step is kept in memory unless a dictionary with other arguments for the collector is given
+        self.datacollector = StreamingCollector({"Total_Words": calculate_total_words,
+                                                 "Different_Words": calculate_different_words,
+                                                 "Prob_Success": prob_inter}, **(collection or {}))
+
+    def step(self):
+        self.successful_interactions = 0
+        self.num_interactions = 0
+        order = self.rng.permutation(self.num_agents)
+        for speakers in np.array_split(order, self.rounds):
+            # With fewer agents than rounds some batches are empty, and a lone agent can't speak at all
+            if len(speakers) == 0 or self.num_agents < 2:
+                continue
+            # Hearers are drawn among the agents that are not speaking in this batch
+            others = np.ones(self.num_agents, dtype=bool)
+            others[speakers] = False
+            hearers = self.rng.choice(np.flatnonzero(others), size=len(speakers), replace=False)
+            self.interact(speakers, hearers)
+        self.datacollector.collect(self)
+
+    def run(self, k):
+        for _ in range(k):
+            self.step()
+
+    def invent_words(self, speakers):
+        # Speakers with an empty inventory make up a new word, ids are never reused
+        new = speakers[self.sizes[speakers] == 0]
+        if len(new) == 0:
+            return
+        ids = np.arange(self.next_word_id, self.next_word_id+len(new))
+        self.next_word_id += len(new)
+        if self.next_word_id > len(self.word_counts):
+            self.word_counts = np.concatenate([self.word_counts, np.zeros_like(self.word_counts)])
+        self.inventory[new, 0] = ids
+        self.sizes[new] = 1
+        self.word_counts[ids] += 1
+
+    def interact(self, speakers, hearers):
+        if len(speakers) == 0:
+            return
+        self.invent_words(speakers)
+        # Each speaker picks a random word of their inventory
+        choice = (self.rng.random(len(speakers))*self.sizes[speakers]).astype(np.int64)
+        words = self.inventory[speakers, choice]
+        # Only the columns used by the largest inventory among the hearers need to be compared
+        width = self.sizes[hearers].max()
+        known = self.inventory[hearers, :width] == words[:, None]
+        known &= np.arange(width) < self.sizes[hearers][:, None]
+        success = known.any(axis=1)
+        self.num_interactions += len(speakers)
+        self.successful_interactions += int(success.sum())
+        # Failures: the hearers add the word to their inventory
+        learners = hearers[~success]
+        learned = words[~success]
+        if len(learners) > 0 and self.sizes[learners].max() >= self.inventory.shape[1]:
+            self.grow_inventories()
+        self.inventory[learners, self.sizes[learners]] = learned
+        self.sizes[learners] += 1
+        self.word_counts += np.bincount(learned, minlength=len(self.word_counts))
+        # Successes: both agents forget everything but the word they agreed on
+        agreed = words[success]
+        for agents in (speakers[success], hearers[success]):
+            rows = self.inventory[agents]
+            used = np.arange(rows.shape[1]) < self.sizes[agents][:, None]
+            self.word_counts -= np.bincount(rows[used], minlength=len(self.word_counts))
+            self.inventory[agents, 0] = agreed
+            self.sizes[agents] = 1
+            self.word_counts += np.bincount(agreed, minlength=len(self.word_counts))
+
+    def grow_inventories(self):
+        extra = np.full_like(self.inventory, no_word)
+        self.inventory = np.concatenate([self.inventory, extra], axis=1)
+
+
+# Same reporters of NamingModel
+def calculate_total_words(model):
+    return int(model.sizes.sum())
+
+
+def calculate_different_words(model):
+    return int(np.count_nonzero(model.word_counts))
+
+
+def prob_inter(model):
+    if model.num_interactions == 0:
+        return 0.0
+    return model.successful_interactions/model.num_interactions
+
+
+def only_one_word(model):
+    return calculate_different_words(model) == 1 and calculate_total_words(model) == model.num_agents
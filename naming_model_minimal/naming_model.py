@@ -2,17 +2,37 @@ from mesa import Agent, Model
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
 from mesa.datacollection import DataCollector
+from collector import StreamingCollector
+from occupancy import Occupancy
+from collections import Counter
+from array import array
+import os
+import time
 import numpy as np
-from random import randint
 
 
-# If this variable is set to True, the behaviour is as described in the article and the same
-# graphs get created for total words, different words and probability of success
-random_interactions = False
-# This file is present in each Linux distribution, contains over 100000 words
-word_file = "./words"
-words = open(word_file).read().splitlines()
-num_words = len(words)
+# This file is present in each Linux distribution, contains over 100000 words. Inside the model words are just
+# integer ids, the file is only read the first time a human readable word is requested
+word_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "words")
+words = None
+
+
+def word_of(word_id):
+    """Human readable spelling of a word id"""
+    global words
+    if words is None:
+        with open(word_file) as f:
+            words = f.read().splitlines()
+    # Ids beyond the size of the dictionary get a suffix, so that different ids are never spelled the same way
+    spelling = words[word_id % len(words)]
+    if word_id >= len(words):
+        spelling += "_%d" % (word_id // len(words))
+    return spelling
+
+
+# Default dimensions of the grid (number of cells x number of cells)
+width = 30
+height = 30
 
 
 class PersonAgent(Agent):
@@ -20,36 +40,30 @@ class PersonAgent(Agent):
     def __init__(self, unique_id, model):
         # Call the superclass constructor
         super().__init__(unique_id, model)
-        # The inventory of the agent, contains the word he has learned
-        self.inventory = np.array([])
+        # The inventory of the agent, contains the ids of the words he has learned
+        self.inventory = array("q")
         # A member that will make it easy to have a listener and a hearer in each interaction
         self.will_listen = False
 
     def move(self):
-        # The agent is almost forced to move, so we don't include the center
-        possible_steps = self.model.grid.get_neighborhood(
-            self.pos, moore=True, include_center=False)
-        # We shuffle the array of possible positions to have at each call a random
-        # direction of movement
-        np.random.shuffle(possible_steps)
-        # We cycle through all the possible steps, as soon as the agent finds a cell with less than two
-        # occupants, they move there
-        for pos in possible_steps:
-            if len(self.model.grid.get_cell_list_contents([pos])) < 2:
-                self.model.grid.move_agent(self, pos)
-                return
+        # The agent is almost forced to move, so we don't include the center. Among the neighbouring cells
+        # with less than two occupants they pick one at random, if there is none they stay put
+        possible_steps = self.model.occupancy.free_neighbours(self.pos)
+        if possible_steps:
+            pos = self.random.choice(possible_steps)
+            self.model.occupancy.move(self.pos, pos)
+            self.model.grid.move_agent(self, pos)
 
     def speak(self, other_agent):
+        """Returns the outcome of the interaction, which is either success or failure"""
         # If it's the first time this agent interacts, they will have an empty inventory
         # and will need to generate a random word
-        if np.size(self.inventory) == 0:
-            new_word = words[randint(0, num_words-1)]
-            # If the word is already present generate a new one
-            while new_word in self.model.global_inventory:
-                new_word = words[randint(0, num_words-1)]
+        if len(self.inventory) == 0:
+            # Ids are never reused, so the new word can't already be present
+            new_word = self.model.new_word_id()
             # Add the generated word to the global inventory and to the agent inventory
-            self.model.global_inventory = np.append(self.model.global_inventory, new_word)
-            self.inventory = np.append(self.inventory, new_word)
+            self.model.add_word(new_word)
+            self.inventory.append(new_word)
         # The number of total interactions goes up by one
         self.model.num_interactions += 1
         # The speaker selects a random word among their inventory
@@ -57,43 +71,42 @@ class PersonAgent(Agent):
         # If the word is not present in the hearer's inventory, it gets added
         # and the interaction ends here
         if word not in other_agent.inventory:
-            other_agent.inventory = np.append(other_agent.inventory, word)
+            other_agent.inventory.append(word)
             # That word must also be added to the global inventory because now there are
             # two of them
-            self.model.global_inventory = np.append(self.model.global_inventory, word)
-            return
+            self.model.add_word(word)
+            return "failure"
         # If we reach this part of the function, then we have a successful interaction
         self.model.successful_interactions += 1
         # All the words must be erased from the global and both the agent's inventories
         for elem in self.inventory:
-            # Search for the index of the word in the global inventory
-            indexes = np.where(self.model.global_inventory == elem)[0]
-            if np.size(indexes) > 0:
-                # Delete word at given index
-                self.model.global_inventory = np.delete(self.model.global_inventory, indexes[0])
+            self.model.remove_word(elem)
         # Do the same thing with the other agent's inventory
         for elem in other_agent.inventory:
-            indexes = np.where(self.model.global_inventory == elem)[0]
-            if np.size(indexes) > 0:
-                self.model.global_inventory = np.delete(self.model.global_inventory, indexes[0])
+            self.model.remove_word(elem)
         # Both the agent's inventories must be reduced to the single word they now share
-        self.inventory = np.array([word])
-        other_agent.inventory = np.array([word])
+        self.inventory = array("q", [word])
+        other_agent.inventory = array("q", [word])
         # Now we add this word to the global inventory (doubled because two agents have it)
-        self.model.global_inventory = np.append(self.model.global_inventory, [word, word])
+        self.model.add_word(word, 2)
+        return "success"
 
-    def step(self):
+    def choose_hearer(self):
+        """Returns the agent this agent is going to speak to, None if they are not speaking in this step"""
         # If we want to check the functioning of the model as described in the article, we use
         # random interaction mechanism (the topology becomes irrelevant)
-        if random_interactions:
-            # Select a random agent among the list of all agents
-            other_agent = self.random.choice(self.model.schedule.agents)
-            # Speak to that agent
-            self.speak(other_agent)
-            # Do nothing else
-            return
-        # First thing, the agent moves
-        self.move()
+        if self.model.random_interactions:
+            # A lone agent has no one to talk to
+            if len(self.model.agents) < 2:
+                return None
+            # Select a random agent among the list of all the other agents
+            other_agent = self.random.choice(self.model.agents)
+            while other_agent is self:
+                other_agent = self.random.choice(self.model.agents)
+            return other_agent
+        # If they are alone in their cell there is no one to talk to
+        if self.model.occupancy.count(self.pos) < 2:
+            return None
         # Checks whether they have a cellmate or not
         cellmate = self.model.grid.get_cell_list_contents([self.pos])
         # Must delete themselves among the list of cellmates, this way the first position
@@ -101,47 +114,113 @@ class PersonAgent(Agent):
         cellmate.remove(self)
         # If there isn't any cellmate, do nothing
         if not np.any(cellmate):
-            return
+            return None
         # If they are a listener, they do nothing but restoring their will_listen member to False
         if self.will_listen:
             self.will_listen = False
-            return
-        # If they are a speaker, they speak to their cellmate, that becomes a listener
-        self.speak(cellmate[0])
+            return None
+        # If they are a speaker, their cellmate becomes a listener
         cellmate[0].will_listen = True
+        return cellmate[0]
+
+    def step(self):
+        if self.model.profiler is not None:
+            self.profiled_step(self.model.profiler)
+            return
+        # With random interactions the agents don't move, otherwise it's the first thing they do
+        if not self.model.random_interactions:
+            self.move()
+        other_agent = self.choose_hearer()
+        if other_agent is not None:
+            self.speak(other_agent)
+
+    def profiled_step(self, profiler):
+        # Same as step, but every phase reports to the profiler
+        start = time.perf_counter()
+        if not self.model.random_interactions:
+            old_pos = self.pos
+            self.move()
+            profiler.count("moves")
+            if self.pos == old_pos:
+                profiler.count("failed_moves")
+            start = profiler.add_time("move", start)
+        other_agent = self.choose_hearer()
+        start = profiler.add_time("choose_hearer", start)
+        if other_agent is None:
+            return
+        outcome = self.speak(other_agent)
+        profiler.add_time("speak", start)
+        profiler.count("interactions")
+        profiler.count("successes" if outcome == "success" else "failures")
 
 
 class NamingModel(Model):
     """The model class"""
-    def __init__(self, n, width, height):
+    def __init__(self, n, width, height, collection=None, random_interactions=False, seed=None, profiler=None):
         # Call the superclass constructor
         super().__init__()
+        # Every random draw of the model and of its agents goes through self.random, so a seed makes a run
+        # reproducible
+        self.reset_randomizer(seed)
         self.running = True
         self.num_agents = n
+        # If this parameter is set to True, the behaviour is as described in the article and the same
+        # graphs get created for total words, different words and probability of success
+        self.random_interactions = random_interactions
+        # Optional PhaseProfiler, when None the steps are not instrumented
+        self.profiler = profiler
         # Members to calculate the probability of success in the interactions
         self.num_interactions = 0
         self.successful_interactions = 0
         # Standard grid and schedule instantiations
         self.grid = MultiGrid(width, height, True)
         self.schedule = RandomActivation(self)
+        # Number of agents in each cell, maximum two for each cell
+        self.occupancy = Occupancy(width, height, 2)
         for i in range(self.num_agents):
-            # Place agents on the grid, maximum two for each cell
+            # Place agents on the grid, drawing among the cells that still have room
             a = PersonAgent(i, self)
             self.schedule.add(a)
-            while a.pos is None:
-                x = self.random.randrange(self.grid.width)
-                y = self.random.randrange(self.grid.height)
-                # Try placing agents as long as there are no more than two in each cell
-                if len(self.grid.get_cell_list_contents([(x, y)])) < 2:
-                    self.grid.place_agent(a, (x, y))
-        # The global inventory is to keep trace of all the words that are stored in the agent's vocabulary
-        self.global_inventory = np.array([])
-        self.datacollector = DataCollector(
-            model_reporters={"Total_Words": calculate_total_words,
-                             "Different_Words": calculate_different_words,
-                             "Prob_Success": prob_inter},
-            agent_reporters={}
-        )
+            pos = self.occupancy.random_free_cell(self.random)
+            self.occupancy.add(pos)
+            self.grid.place_agent(a, pos)
+        # Agents are never added or removed, so the list of all agents is built once
+        self.agents = self.schedule.agents
+        # The global inventory is to keep trace of all the words that are stored in the agent's vocabulary,
+        # it maps each word to the number of agents that know it
+        self.global_inventory = Counter()
+        # Id that will be given to the next invented word
+        self.next_word_id = 0
+        # Running total of the words in the global inventory, repetitions included
+        self.total_words = 0
+        model_reporters = {"Total_Words": calculate_total_words,
+                           "Different_Words": calculate_different_words,
+                           "Prob_Success": prob_inter}
+        # By default every step is collected by Mesa's DataCollector, for long runs a dictionary with the arguments
+        # of a StreamingCollector can be given instead
+        if collection is None:
+            self.datacollector = DataCollector(model_reporters=model_reporters, agent_reporters={})
+        else:
+            self.datacollector = StreamingCollector(model_reporters, **collection)
+
+    def new_word_id(self):
+        word = self.next_word_id
+        self.next_word_id += 1
+        return word
+
+    def add_word(self, word, times=1):
+        self.global_inventory[word] += times
+        self.total_words += times
+
+    def remove_word(self, word):
+        # Removes a single occurrence of the word, if present
+        if word not in self.global_inventory:
+            return
+        self.global_inventory[word] -= 1
+        self.total_words -= 1
+        # Words nobody knows anymore are dropped, this way the number of keys is the number of different words
+        if self.global_inventory[word] == 0:
+            del self.global_inventory[word]
 
     def step(self):
         # Every time we call the step function, we must restore these variables to 0 so that we evaluate
@@ -150,16 +229,22 @@ class NamingModel(Model):
         self.num_interactions = 0
         self.schedule.step()
         # After executing one step, collect the data
+        if self.profiler is None:
+            self.datacollector.collect(self)
+            return
+        start = time.perf_counter()
         self.datacollector.collect(self)
+        self.profiler.add_time("collect", start)
+        self.profiler.end_step()
 
 
 # Functions to calculate the variables we want to keep track of
 def calculate_total_words(model):
-    return len(model.global_inventory)
+    return model.total_words
 
 
 def calculate_different_words(model):
-    return len(np.unique(model.global_inventory))
+    return len(model.global_inventory)
 
 
 def prob_inter(model):
@@ -167,3 +252,8 @@ def prob_inter(model):
         return 0.0
     probability = model.successful_interactions/model.num_interactions
     return probability
+
+
+# Utility function to check whether the agents have reached consensus, that is they all know the same single word
+def only_one_word(model):
+    return calculate_different_words(model) == 1 and calculate_total_words(model) == model.num_agents
@@ -1,12 +1,11 @@
-from naming_model import NamingModel
-from mesa.visualization.modules import CanvasGrid
+import numpy as np
+from naming_model import NamingModel, width, height, word_of
+from mesa.visualization.modules import CanvasGrid, TextElement
 from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.UserParam import Slider
 from mesa.visualization.modules import ChartModule
+from live_server import DiffGrid, LiveServer
 
-# Dimensions of the grid (number of cells x number of cells)
-width = 30
-height = 30
 n_agents = [400, 100, 900, 5]  # default, min, max, increment
 
 
@@ -15,7 +14,7 @@ def agent_portrayal(agent):
                  "r": 0.5, "Layer": 0}
     # If there is an interaction occurring in that cell, paint a green circle, otherwise
     # a red circle
-    if len(agent.model.grid.get_cell_list_contents([agent.pos])) > 1:
+    if agent.model.occupancy.count(agent.pos) > 1:
         portrayal["Color"] = "green"
     return portrayal
 
@@ -33,10 +32,40 @@ prob_graph = ChartModule(
     [{"Label": "Prob_Success", "Color": "Green"}],
     data_collector_name='datacollector'
 )
+
+
+class MostCommonWord(TextElement):
+    """The word known by the most agents, spelled as a readable word instead of its id"""
+    def render(self, model):
+        if not model.global_inventory:
+            return "No word invented yet"
+        word, count = model.global_inventory.most_common(1)[0]
+        return "Most common word: %s, known by %d agents" % (word_of(word), count)
+
+
+most_common_word = MostCommonWord()
 number_of_agents_slider = Slider(
     "Number of Agents", n_agents[0], n_agents[1], n_agents[2], n_agents[3])
 server = ModularServer(NamingModel,
-                       [grid, tot_graph, diff_graph, prob_graph],
+                       [grid, most_common_word, tot_graph, diff_graph, prob_graph],
                        "Minimal Naming Game",
                        {"n": number_of_agents_slider, "width": width, "height": height}
                        )
+
+
+def cell_state(model):
+    # The number of agents in each cell is already the code of the cell: red for one agent, green for two
+    return np.frombuffer(model.occupancy.counts, dtype=np.uint8).copy()
+
+
+def make_live_server(frame_steps=None):
+    """Server for long runs: the model runs in the background and the grid is sent only where it changed, every
+    frame_steps steps or, if None, at the frame rate chosen in the page. The series are kept in a ring buffer so
+    that memory stays bounded"""
+    live_grid = DiffGrid(cell_state, [None, "red", "green"], width, height, 500, 500)
+    return LiveServer(NamingModel,
+                      [live_grid, most_common_word, tot_graph, diff_graph, prob_graph],
+                      "Minimal Naming Game",
+                      {"n": number_of_agents_slider, "width": width, "height": height,
+                       "collection": {"ring": True, "buffer_size": 1024}},
+                      frame_steps=frame_steps)
@@ -0,0 +1,122 @@
+import numpy as np
+# The reporters are the same of the mean-field model
+from mean_field import (MeanFieldNamingModel, default_rounds, calculate_total_words, calculate_different_words,
+                        prob_inter)
+
+
+# Waiting couples are played together only if at least this many of them are disjoint
+min_batch = 64
+# Inventories with up to this many words are rows of the matrix. Larger ones, like the ones of the hubs that hear
+# from many neighbours, are kept apart as a list and a set of words, and their couples are played one at a time
+max_width = 64
+
+
+class NetworkNamingModel(MeanFieldNamingModel):
+    """The minimal model on a contact network (see network.py): each node is an agent, and in every step each
+    agent that has at least a neighbour speaks once, in random order, to a random neighbour. As in the mean-field
+    model the speakers are split into `rounds` batches of disjoint couples. A couple whose hearer is already busy
+    in its batch, or who has a large inventory, is played later with the same hearer"""
+    def __init__(self, network, seed=None, collection=None, rounds=default_rounds):
+        super().__init__(network.num_nodes, seed, collection, rounds)
+        self.network = network
+        # Isolated agents have no one to talk to
+        self.talkers = np.flatnonzero(network.degrees() > 0)
+        # Words and set of words of the agents with more than max_width words
+        self.large = {}
+
+    def step(self):
+        self.successful_interactions = 0
+        self.num_interactions = 0
+        waiting_speakers = []
+        waiting_hearers = []
+        for speakers in np.array_split(self.rng.permutation(self.talkers), self.rounds):
+            if len(speakers) == 0:
+                continue
+            hearers = self.network.random_neighbours(speakers, self.rng)
+            free = self.playable(speakers, hearers)
+            self.interact(speakers[free], hearers[free])
+            waiting_speakers.append(speakers[~free])
+            waiting_hearers.append(hearers[~free])
+        speakers = np.concatenate(waiting_speakers)
+        hearers = np.concatenate(waiting_hearers)
+        # The waiting couples are played in batches as long as a batch plays many of them at once. Around a hub most
+        # couples share the same hearer, those are played one at a time
+        while len(speakers) > min_batch:
+            free = self.playable(speakers, hearers)
+            if free.sum() < min_batch:
+                break
+            self.interact(speakers[free], hearers[free])
+            speakers = speakers[~free]
+            hearers = hearers[~free]
+        for speaker, hearer in zip(speakers.tolist(), hearers.tolist()):
+            self.interact_one(speaker, hearer)
+        self.datacollector.collect(self)
+
+    def playable(self, speakers, hearers):
+        """Mask of the couples that interact can play at once: disjoint, the speaker's inventory is a row of the
+        matrix and the hearer's row has room for one more word"""
+        free = disjoint_couples(speakers, hearers)
+        free &= self.sizes[speakers] <= max_width
+        free &= self.sizes[hearers] < max_width
+        return free
+
+    def words_of(self, agent):
+        if agent in self.large:
+            return self.large[agent][0]
+        return self.inventory[agent, :self.sizes[agent]].tolist()
+
+    def interact_one(self, speaker, hearer):
+        """Same as interact for a single couple, without the cost of NumPy calls on tiny arrays. It also handles
+        the inventories larger than max_width"""
+        if self.sizes[speaker] == 0:
+            self.invent_words(np.array([speaker]))
+        counts = self.word_counts
+        spoken = self.words_of(speaker)
+        word = spoken[int(self.rng.random()*len(spoken))]
+        self.num_interactions += 1
+        if hearer in self.large:
+            known = word in self.large[hearer][1]
+        else:
+            known = word in self.words_of(hearer)
+        if not known:
+            self.learn(hearer, word)
+            counts[word] += 1
+            return
+        self.successful_interactions += 1
+        for agent in (speaker, hearer):
+            for forgotten in self.words_of(agent):
+                counts[forgotten] -= 1
+            self.large.pop(agent, None)
+            self.inventory[agent, 0] = word
+            self.sizes[agent] = 1
+            counts[word] += 1
+
+    def learn(self, agent, word):
+        size = int(self.sizes[agent])
+        if agent in self.large:
+            words, known = self.large[agent]
+            words.append(word)
+            known.add(word)
+        elif size < max_width:
+            if size >= self.inventory.shape[1]:
+                self.grow_inventories()
+            self.inventory[agent, size] = word
+        else:
+            words = self.inventory[agent, :size].tolist()+[word]
+            self.large[agent] = (words, set(words))
+        self.sizes[agent] += 1
+
+
+def disjoint_couples(speakers, hearers):
+    """Mask of the couples that can interact at the same time: the hearer is not speaking and is not the hearer
+    of an earlier couple"""
+    free = ~np.isin(hearers, speakers)
+    first = np.zeros(len(hearers), dtype=bool)
+    first[np.unique(hearers, return_index=True)[1]] = True
+    free &= first
+    return free
+
+
+def only_one_word(model):
+    # Isolated agents never speak nor hear, so they never get a word
+    return calculate_different_words(model) == 1 and calculate_total_words(model) == len(model.talkers)